@@ -0,0 +1,346 @@
+"""
+Benchmark Harness: adaptive, repeated timing with robust statistics
+Calibrates the iteration count per workload so every trial runs long enough
+to be timed reliably, warms up, repeats the trial, and summarises wall and
+CPU time per operation with median, IQR and a bootstrap confidence interval;
+also profiles peak traced allocation and RSS of a single call, and records
+per-call latency distributions for tail percentiles
+"""
+
+import os
+import json
+import math
+import time
+import random
+import platform
+import statistics
+import subprocess
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DEFAULT_MIN_TRIAL_TIME = 0.05  # Seconds each timed trial should last
+DEFAULT_REPEATS = 7
+DEFAULT_WARMUP_TIME = 0.02
+BOOTSTRAP_RESAMPLES = 1000
+CONFIDENCE = 0.95
+DEFAULT_LATENCY_CALLS = 10000
+DEFAULT_LATENCY_WARMUP = 200
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _run(func, number):
+    """Wall and CPU seconds for number calls of func"""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def calibrate(func, min_trial_time=DEFAULT_MIN_TRIAL_TIME):
+    """Smallest power-of-two iteration count whose run lasts min_trial_time"""
+    number = 1
+    while True:
+        wall, _ = _run(func, number)
+        if wall >= min_trial_time or number >= 1 << 30:
+            return number
+        # Jump straight to the estimate once the timing is meaningful
+        if wall > min_trial_time / 100:
+            number = max(number * 2, 1 << int(number * min_trial_time / wall).bit_length())
+        else:
+            number *= 2
+
+
+def bootstrap_median_ci(samples, confidence=CONFIDENCE, resamples=BOOTSTRAP_RESAMPLES, seed=0):
+    """Percentile bootstrap confidence interval of the median"""
+    if len(samples) < 2:
+        return samples[0], samples[0]
+    rng = random.Random(seed)
+    medians = sorted(
+        statistics.median(rng.choices(samples, k=len(samples)))
+        for _ in range(resamples)
+    )
+    tail = (1 - confidence) / 2
+    return medians[int(tail * (resamples - 1))], medians[int((1 - tail) * (resamples - 1))]
+
+
+def mann_whitney_u(a, b):
+    """
+    Two-sided Mann-Whitney U test (normal approximation with tie correction)
+    
+    Returns:
+        Tuple of (U statistic of a, p-value); p is 1.0 when the samples
+        cannot be told apart (all values tied)
+    """
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    n = n1 + n2
+    rank_sum_a = 0.0
+    tie_term = 0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1  # Average rank of the tied run
+        rank_sum_a += rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        tie_term += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)  # Continuity correction
+    return u, min(1.0, 2 * (1 - statistics.NormalDist().cdf(max(z, 0.0))))
+
+
+def summarize(samples):
+    """
+    Robust summary of per-operation times
+    
+    Returns:
+        Dict with median, mean, stdev, q1, q3, iqr, ci_low, ci_high, min
+        and max (same unit as the samples)
+    """
+    ordered = sorted(samples)
+    if len(ordered) >= 2:
+        q1, _, q3 = statistics.quantiles(ordered, n=4, method='inclusive')
+    else:
+        q1 = q3 = ordered[0]
+    ci_low, ci_high = bootstrap_median_ci(ordered)
+    return {
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'stdev': statistics.stdev(ordered) if len(ordered) >= 2 else 0.0,
+        'q1': q1,
+        'q3': q3,
+        'iqr': q3 - q1,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'min': ordered[0],
+        'max': ordered[-1],
+    }
+
+
+def measure(func, repeats=DEFAULT_REPEATS, min_trial_time=DEFAULT_MIN_TRIAL_TIME,
+            warmup_time=DEFAULT_WARMUP_TIME, number=None):
+    """
+    Time a zero-argument callable
+    
+    Args:
+        func: Operation to time
+        repeats: Timed trials
+        min_trial_time: Target seconds per trial, used to pick the iteration count
+        warmup_time: Seconds of untimed calls before the trials
+        number: Fixed iterations per trial (skips calibration)
+    
+    Returns:
+        Dict with number, repeats, and 'wall'/'cpu' summaries in seconds
+        per operation plus the raw per-trial samples
+    """
+    func()  # First call pays one-off costs (imports, table builds)
+    if number is None:
+        number = calibrate(func, min_trial_time)
+    
+    deadline = time.perf_counter() + warmup_time
+    while time.perf_counter() < deadline:
+        _run(func, max(1, number // 10))
+    
+    wall_samples, cpu_samples = [], []
+    for _ in range(repeats):
+        wall, cpu = _run(func, number)
+        wall_samples.append(wall / number)
+        cpu_samples.append(cpu / number)
+    
+    return {
+        'number': number,
+        'repeats': repeats,
+        'wall': summarize(wall_samples),
+        'cpu': summarize(cpu_samples),
+        'wall_samples': wall_samples,
+        'cpu_samples': cpu_samples,
+    }
+
+
+def percentile(ordered, p):
+    """Linearly interpolated p-th percentile (0-100) of sorted samples"""
+    position = (len(ordered) - 1) * p / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def sample_latency(func, calls=DEFAULT_LATENCY_CALLS, warmup_calls=DEFAULT_LATENCY_WARMUP):
+    """Per-call wall seconds of calls individually timed calls"""
+    for _ in range(warmup_calls):
+        func()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(calls):
+        start = clock()
+        func()
+        samples.append(clock() - start)
+    return [ns / 1e9 for ns in samples]
+
+
+def latency_summary(samples, points=LATENCY_PERCENTILES):
+    """
+    Tail-latency summary of per-call times
+    
+    Returns:
+        Dict with mean, min, max and one 'p<point>' entry per percentile
+        (e.g. p50, p99.9), same unit as the samples
+    """
+    ordered = sorted(samples)
+    summary = {'mean': statistics.fmean(ordered), 'min': ordered[0], 'max': ordered[-1]}
+    for point in points:
+        summary[f'p{point:g}'] = percentile(ordered, point)
+    return summary
+
+
+def _rss_status(field):
+    """VmRSS/VmHWM from /proc in bytes, or None off Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reset the kernel's RSS high-water mark; False if unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure_memory(func, size):
+    """
+    Memory cost of one call of a zero-argument callable
+    
+    Peak traced memory counts every Python allocation live at the worst
+    point of the call, relative to what was live before it. Peak RSS is the
+    process high-water mark during the call (reset first where the kernel
+    allows it); RSS growth can read low once freed memory is reused.
+    
+    Args:
+        func: Operation to profile
+        size: Bytes processed per call, for the per-MB figure
+    
+    Returns:
+        Dict with peak_traced, allocated_per_mb, rss_before, rss_peak and
+        rss_growth in bytes (RSS values None where unavailable)
+    """
+    func()  # Exclude one-off costs (imports, table builds)
+    
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.clear_traces()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        peak_traced = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    
+    # Untraced run for RSS, so tracemalloc's own bookkeeping is not counted
+    rss_before = _rss_status('VmRSS')
+    if _reset_peak_rss():
+        func()
+        rss_peak = _rss_status('VmHWM')
+    else:
+        func()
+        rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None
+    
+    return {
+        'peak_traced': peak_traced,
+        'allocated_per_mb': peak_traced / (size / (1024 * 1024)) if size else 0.0,
+        'rss_before': rss_before,
+        'rss_peak': rss_peak,
+        'rss_growth': max(0, rss_peak - rss_before) if rss_peak is not None and rss_before is not None else None,
+    }
+
+
+def _cpu_info():
+    """CPU model name and feature flags from /proc/cpuinfo (Linux only)"""
+    model, flags = platform.processor(), []
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                name = name.strip()
+                if name == 'model name' and value.strip():
+                    model = value.strip()
+                elif name in ('flags', 'Features') and not flags:
+                    flags = value.split()
+                if name == '' and flags:
+                    break  # Past the first CPU
+    except OSError:
+        pass
+    return model, flags
+
+
+def _git_revision():
+    """Commit of the source tree and whether it has uncommitted changes"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def environment():
+    """Interpreter, library, source and machine details recorded alongside results"""
+    try:
+        import Crypto
+        pycryptodome = Crypto.__version__
+    except ImportError:
+        pycryptodome = None
+    cpu_model, cpu_flags = _cpu_info()
+    git_commit, git_dirty = _git_revision()
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'pycryptodome': pycryptodome,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_model': cpu_model,
+        'cpu_flags': cpu_flags,
+        'cpu_count': os.cpu_count(),
+        'git_commit': git_commit,
+        'git_dirty': git_dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def write_json(path, results, settings=None):
+    """Write results with the environment and harness settings as JSON"""
+    document = {
+        'environment': environment(),
+        'settings': settings or {},
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
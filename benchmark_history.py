@@ -0,0 +1,280 @@
+"""
+Benchmark History: every performance_analysis.py run kept in a JSONL file
+One line per run with the git commit, Python/pycryptodome versions and CPU,
+plus the per-trial samples of each cipher, operation and size, so any two
+runs can be compared for statistically significant changes and trends plotted
+"""
+
+import os
+import sys
+import json
+import argparse
+from benchmark_harness import environment, mann_whitney_u
+
+DEFAULT_HISTORY = 'benchmark_history.jsonl'
+
+# A change is flagged when the trial samples differ at this significance
+# level and the medians by at least this fraction
+DEFAULT_ALPHA = 0.01
+DEFAULT_THRESHOLD = 0.05
+
+
+def append_run(path, results, settings=None):
+    """
+    Append one run to the history
+    
+    Args:
+        path: JSONL history file (created if missing)
+        results: List of dicts with cipher, operation, size, and the
+                 harness 'wall' summary and 'wall_samples'
+        settings: Harness settings of the run
+    
+    Returns:
+        The stored run record
+    """
+    run = {
+        'environment': environment(),
+        'settings': settings or {},
+        'results': [{
+            'cipher': r['cipher'],
+            'operation': r['operation'],
+            'size': r['size'],
+            'median': r['wall']['median'],
+            'ci_low': r['wall']['ci_low'],
+            'ci_high': r['wall']['ci_high'],
+            'samples': r['wall_samples'],
+        } for r in results],
+    }
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+    return run
+
+
+def load_runs(path=DEFAULT_HISTORY):
+    """All runs in the history, oldest first"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def select_run(runs, ref):
+    """
+    Find a run by position or commit
+    
+    Args:
+        runs: Runs from load_runs()
+        ref: 1-based run number, negative offset from the end (-1 is the
+             latest), or a git commit prefix (latest run of that commit)
+    
+    Returns:
+        Tuple of (run number, run)
+    """
+    try:
+        index = int(ref)
+    except ValueError:
+        index = None
+    if index is not None and (index < 0 or 1 <= index <= len(runs)):
+        position = index - 1 if index > 0 else len(runs) + index
+        if position < 0:
+            raise ValueError(f"No run {ref} (history has {len(runs)} runs)")
+        return position + 1, runs[position]
+    
+    for position in range(len(runs) - 1, -1, -1):
+        if (runs[position]['environment'].get('git_commit') or '').startswith(str(ref)):
+            return position + 1, runs[position]
+    raise ValueError(f"No run for commit '{ref}'")
+
+
+def describe_run(number, run):
+    """One-line summary of a run"""
+    env = run['environment']
+    commit = (env.get('git_commit') or 'unknown')[:10] + ('+dirty' if env.get('git_dirty') else '')
+    return (f"#{number:<4d} {env.get('timestamp', '?'):24s} {commit:16s} Python {env.get('python')} | "
+            f"pycryptodome {env.get('pycryptodome')} | {env.get('cpu_model') or env.get('machine')}")
+
+
+def compare(baseline, current, alpha=DEFAULT_ALPHA, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare every cipher, operation and size present in both runs
+    
+    Returns:
+        List of dicts with cipher, operation, size, baseline and current
+        medians (seconds), change (fraction, positive is slower), p_value
+        and status ('regression', 'improvement' or 'unchanged')
+    """
+    before = {(r['cipher'], r['operation'], r['size']): r for r in baseline['results']}
+    rows = []
+    for r in current['results']:
+        key = (r['cipher'], r['operation'], r['size'])
+        if key not in before:
+            continue
+        old = before[key]
+        change = r['median'] / old['median'] - 1 if old['median'] else 0.0
+        _, p_value = mann_whitney_u(old['samples'], r['samples'])
+        status = 'unchanged'
+        if p_value < alpha and abs(change) >= threshold:
+            status = 'regression' if change > 0 else 'improvement'
+        rows.append({
+            'cipher': r['cipher'],
+            'operation': r['operation'],
+            'size': r['size'],
+            'baseline': old['median'],
+            'current': r['median'],
+            'change': change,
+            'p_value': p_value,
+            'status': status,
+        })
+    return rows
+
+
+def environment_differences(baseline, current):
+    """Environment fields that differ between two runs, as (name, old, new)"""
+    fields = ['python', 'implementation', 'pycryptodome', 'platform', 'cpu_model', 'cpu_count']
+    old, new = baseline['environment'], current['environment']
+    differences = [(name, old.get(name), new.get(name)) for name in fields if old.get(name) != new.get(name)]
+    if set(old.get('cpu_flags') or []) != set(new.get('cpu_flags') or []):
+        differences.append(('cpu_flags', ' '.join(sorted(set(old.get('cpu_flags') or []) - set(new.get('cpu_flags') or []))) or '-',
+                            ' '.join(sorted(set(new.get('cpu_flags') or []) - set(old.get('cpu_flags') or []))) or '-'))
+    return differences
+
+
+def plot_trends(runs, path='benchmark_trends.png', operation='encrypt', size=32768, ciphers=None):
+    """
+    Plot the median time (with its confidence interval) of each cipher across runs
+    
+    Args:
+        runs: Runs from load_runs()
+        path: Output image
+        operation: 'encrypt' or 'decrypt'
+        size: Data size in bytes
+        ciphers: Ciphers to include (default: all)
+    """
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    series = {}
+    for number, run in enumerate(runs, 1):
+        for r in run['results']:
+            if r['operation'] == operation and r['size'] == size and (not ciphers or r['cipher'] in ciphers):
+                series.setdefault(r['cipher'], []).append((number, r))
+    if not series:
+        raise ValueError(f"No {operation} results at {size} bytes in the history")
+    
+    labels = [f"#{n}\n{(run['environment'].get('git_commit') or '?')[:7]}" for n, run in enumerate(runs, 1)]
+    colors = plt.cm.tab10(np.linspace(0, 1, len(series)))
+    
+    plt.figure(figsize=(14, 7))
+    for idx, (cipher_name, points) in enumerate(series.items()):
+        numbers = [n for n, _ in points]
+        medians = np.array([r['median'] * 1000 for _, r in points])
+        errors = np.array([[(r['median'] - r['ci_low']) * 1000 for _, r in points],
+                           [(r['ci_high'] - r['median']) * 1000 for _, r in points]])
+        plt.errorbar(numbers, medians, yerr=errors, marker='o', capsize=3, color=colors[idx], label=cipher_name)
+    plt.xticks(range(1, len(runs) + 1), labels, fontsize=7)
+    plt.yscale('log')
+    plt.xlabel('Run (commit)')
+    plt.ylabel('Median Time (ms, log scale)')
+    plt.title(f'{operation.capitalize()} Time at {size} bytes Across Runs', fontweight='bold')
+    plt.legend(fontsize=8, loc='best')
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+    print(f"✓ Trend plot saved to '{path}'")
+
+
+def list_command(args):
+    """Print one line per recorded run"""
+    runs = load_runs(args.history)
+    if not runs:
+        print(f"No runs in '{args.history}'")
+        return 0
+    for number, run in enumerate(runs, 1):
+        print(describe_run(number, run))
+    return 0
+
+
+def compare_command(args):
+    """Print flagged changes between two runs; exit status 1 if any regressed"""
+    runs = load_runs(args.history)
+    try:
+        base_number, baseline = select_run(runs, args.baseline)
+        current_number, current = select_run(runs, args.current)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    
+    print("\n" + "="*80)
+    print("BENCHMARK COMPARISON")
+    print("="*80)
+    print("Baseline: " + describe_run(base_number, baseline))
+    print("Current:  " + describe_run(current_number, current))
+    for name, old, new in environment_differences(baseline, current):
+        print(f"  ! {name} differs: {old} -> {new}")
+    
+    rows = compare(baseline, current, args.alpha, args.threshold)
+    trials = min((len(r['samples']) for r in baseline['results'] + current['results']), default=0)
+    if mann_whitney_u(list(range(trials)), list(range(trials, 2 * trials)))[1] >= args.alpha:
+        print(f"  ! {trials} trials per result cannot reach p < {args.alpha}; record runs with more --repeats")
+    print(f"\nFlagged when p < {args.alpha} (Mann-Whitney U over trial samples) and the median "
+          f"changes by at least {args.threshold * 100:.0f}%")
+    print("-" * 80)
+    print(f"{'Cipher':20s} {'Op':8s} {'Size':>7s} {'Baseline (ms)':>14s} {'Current (ms)':>13s} {'Change':>8s} {'p':>8s}  Status")
+    for row in rows:
+        if args.all or row['status'] != 'unchanged':
+            print(f"{row['cipher']:20s} {row['operation']:8s} {row['size']:7d} {row['baseline'] * 1000:14.4f} "
+                  f"{row['current'] * 1000:13.4f} {row['change'] * 100:+7.1f}% {row['p_value']:8.4f}  {row['status'].upper()}")
+    
+    regressions = sum(1 for row in rows if row['status'] == 'regression')
+    improvements = sum(1 for row in rows if row['status'] == 'improvement')
+    print("-" * 80)
+    print(f"{len(rows)} compared | {regressions} regressions | {improvements} improvements")
+    
+    if args.plot:
+        plot_trends(runs, args.plot, args.operation, args.size)
+    return 1 if regressions else 0
+
+
+def plot_command(args):
+    """Write the trend plot"""
+    try:
+        plot_trends(load_runs(args.history), args.output, args.operation, args.size, args.cipher)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history: list runs, compare them, plot trends")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help=f'History file (default: {DEFAULT_HISTORY})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    commands.add_parser('list', help='List recorded runs')
+    
+    compare_parser = commands.add_parser('compare', help='Flag significant changes between two runs (exit 1 on regressions)')
+    compare_parser.add_argument('--baseline', default='-2', help='Run number, negative offset or commit prefix (default: -2, the previous run)')
+    compare_parser.add_argument('--current', default='-1', help='Run number, negative offset or commit prefix (default: -1, the latest run)')
+    compare_parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help=f'Significance level (default: {DEFAULT_ALPHA})')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f'Smallest median change flagged, as a fraction (default: {DEFAULT_THRESHOLD})')
+    compare_parser.add_argument('--all', action='store_true', help='Also list unchanged results')
+    compare_parser.add_argument('--plot', metavar='PATH', help='Also plot trends across all runs to PATH')
+    
+    plot_parser = commands.add_parser('plot', help='Plot median times across runs')
+    plot_parser.add_argument('--output', default='benchmark_trends.png', help='Image path (default: benchmark_trends.png)')
+    plot_parser.add_argument('--cipher', action='append', help='Cipher to include (repeatable, default: all)')
+    
+    for sub in (compare_parser, plot_parser):
+        sub.add_argument('--operation', choices=['encrypt', 'decrypt'], default='encrypt', help='Operation to plot (default: encrypt)')
+        sub.add_argument('--size', type=int, default=32768, help='Data size to plot (default: 32768)')
+    
+    args = parser.parse_args()
+    handlers = {'list': list_command, 'compare': compare_command, 'plot': plot_command}
+    sys.exit(handlers[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Streaming base64 armor
+Incremental encoder and decoder with the same update()/finalize() interface
+as SaltedEncryptor/SaltedDecryptor, so armored transport of any size runs
+chunk by chunk in constant memory
+"""
+
+import binascii
+from present_cipher import LazyModule
+
+np = LazyModule('numpy')
+
+
+# Characters per armored line, as in MIME
+ARMOR_LINE_LENGTH = 76
+
+_WHITESPACE = b' \t\r\n'
+
+
+class ArmorEncoder:
+    """Base64-encode a byte stream into fixed-length lines"""
+    
+    def __init__(self, line_length=ARMOR_LINE_LENGTH):
+        if line_length <= 0 or line_length % 4:
+            raise ValueError("Line length must be a positive multiple of 4")
+        self.line_length = line_length
+        self.line_bytes = line_length // 4 * 3
+        self.pending = b''
+        self.finalized = False
+    
+    def update(self, data):
+        """Encode data, returning every complete line (with newlines)"""
+        if self.finalized:
+            raise ValueError("Encoder already finalized")
+        data = self.pending + bytes(data) if self.pending else bytes(data)
+        usable = len(data) - len(data) % self.line_bytes
+        self.pending = data[usable:]
+        if not usable:
+            return b''
+        
+        # Encode all complete lines at once, then append a newline to each
+        # row of the encoded text instead of slicing line by line
+        encoded = np.frombuffer(binascii.b2a_base64(data[:usable], newline=False), dtype=np.uint8)
+        lines = np.empty((usable // self.line_bytes, self.line_length + 1), dtype=np.uint8)
+        lines[:, :-1] = encoded.reshape(-1, self.line_length)
+        lines[:, -1] = ord('\n')
+        return lines.tobytes()
+    
+    def finalize(self):
+        """Encode the final (possibly short, padded) line"""
+        if self.finalized:
+            raise ValueError("Encoder already finalized")
+        self.finalized = True
+        if not self.pending:
+            return b''
+        return binascii.b2a_base64(self.pending)
+
+
+class ArmorDecoder:
+    """Decode a base64 stream, ignoring line breaks and other whitespace"""
+    
+    def __init__(self):
+        self.pending = b''
+        self.finalized = False
+    
+    def update(self, text):
+        """Decode text, returning the bytes of every complete 4-character group"""
+        if self.finalized:
+            raise ValueError("Decoder already finalized")
+        text = bytes(text).translate(None, _WHITESPACE)
+        if self.pending:
+            text = self.pending + text
+        usable = len(text) - len(text) % 4
+        self.pending = text[usable:]
+        try:
+            return binascii.a2b_base64(text[:usable])
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 armor: {e}") from None
+    
+    def finalize(self):
+        """Check that the stream ended on a complete group"""
+        if self.finalized:
+            raise ValueError("Decoder already finalized")
+        self.finalized = True
+        if self.pending:
+            raise ValueError("Truncated base64 armor")
+        return b''
+
+
+def armor(data, line_length=ARMOR_LINE_LENGTH):
+    """Armor a whole buffer"""
+    encoder = ArmorEncoder(line_length)
+    return encoder.update(data) + encoder.finalize()
+
+
+def dearmor(text):
+    """Decode a whole armored buffer"""
+    decoder = ArmorDecoder()
+    return decoder.update(text) + decoder.finalize()
@@ -0,0 +1,162 @@
+"""
+Self-describing binary ciphertext container
+A fixed-size header carrying everything needed to decrypt except the key,
+followed by the raw ciphertext, so no base64 and no separate salt channel
+
+Header layout (integers big-endian):
+    magic 'SCBX' | uint8 version | uint8 mode | backend name (16 bytes,
+    NUL padded) | uint8 salt length | salt (16 bytes, zero padded) |
+    uint64 plaintext length
+The ciphertext starts at HEADER_SIZE. A container streamed to a sink that
+cannot seek back records UNKNOWN_LENGTH as its plaintext length
+"""
+
+import struct
+from present_cipher import (
+    BACKENDS,
+    DEFAULT_BACKEND,
+    generate_salt, generate_ctr_salt,
+    cfb_encrypt, cfb_decrypt,
+    cbc_encrypt, cbc_decrypt,
+    ctr_encrypt, ctr_decrypt
+)
+
+
+CONTAINER_MAGIC = b'SCBX'
+CONTAINER_VERSION = 1
+_CONTAINER_MODES = {'CFB': 0, 'CBC': 1, 'CTR': 2}
+_HEADER = struct.Struct('>4sBB16sB16sQ')
+HEADER_SIZE = _HEADER.size
+
+# Plaintext length of a container whose writer could not know it up front
+UNKNOWN_LENGTH = 2 ** 64 - 1
+
+_FUNCTIONS = {
+    'CFB': (cfb_encrypt, cfb_decrypt),
+    'CBC': (cbc_encrypt, cbc_decrypt),
+    'CTR': (ctr_encrypt, ctr_decrypt),
+}
+
+
+def pack_header(mode, backend, salt, plaintext_length):
+    """Container header bytes"""
+    mode = mode.upper()
+    if mode not in _CONTAINER_MODES:
+        raise ValueError("Mode must be 'cfb', 'cbc' or 'ctr'")
+    name = backend.encode('ascii')
+    if len(name) > 16 or len(salt) > 16:
+        raise ValueError("Backend name and salt must fit in 16 bytes")
+    return _HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, _CONTAINER_MODES[mode],
+                        name, len(salt), salt, plaintext_length)
+
+
+def is_container(buffer):
+    """True if buffer starts with a container header"""
+    return len(buffer) >= HEADER_SIZE and bytes(buffer[:len(CONTAINER_MAGIC)]) == CONTAINER_MAGIC
+
+
+def is_container_file(path):
+    """True if the file at path starts with a container header"""
+    with open(path, 'rb') as f:
+        return is_container(f.read(HEADER_SIZE))
+
+
+def parse_header(buffer):
+    """
+    Parse a container header from any buffer (bytes, memoryview, mmap)
+    
+    Returns:
+        Dict with mode, backend, salt and plaintext_length
+    """
+    if not is_container(buffer):
+        raise ValueError("Not a SaltedCipher container")
+    _, version, mode_id, name, salt_length, salt, plaintext_length = _HEADER.unpack_from(buffer)
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"Unsupported container version {version}")
+    modes = {v: k for k, v in _CONTAINER_MODES.items()}
+    if mode_id not in modes:
+        raise ValueError(f"Unknown mode id {mode_id}")
+    backend = name.rstrip(b'\0').decode('ascii')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'")
+    return {
+        'mode': modes[mode_id],
+        'backend': backend,
+        'salt': salt[:salt_length],
+        'plaintext_length': plaintext_length,
+    }
+
+
+def parse_container(buffer):
+    """
+    Split a container without copying its body
+    
+    Returns:
+        Tuple of (header dict, memoryview of the ciphertext)
+    """
+    header = parse_header(buffer)
+    return header, memoryview(buffer)[HEADER_SIZE:]
+
+
+def check_plaintext_length(header, length):
+    """Raise ValueError unless length matches the header's plaintext length"""
+    # The padding fallback hides a wrong key; the recorded length does not
+    if header['plaintext_length'] not in (length, UNKNOWN_LENGTH):
+        raise ValueError("Decrypted length does not match the header (wrong key or corrupted data)")
+
+
+def write_container(f, mode, backend, salt, plaintext_length, ciphertext):
+    """Write a header and the raw ciphertext to an open binary file"""
+    f.write(pack_header(mode, backend, salt, plaintext_length))
+    f.write(ciphertext)
+
+
+def seal(plaintext, key, mode='cbc', salt=None, backend=DEFAULT_BACKEND, fast=False):
+    """
+    Encrypt plaintext into a container
+    
+    Args:
+        plaintext: Bytes to encrypt
+        key: Encryption key or keyring handle
+        mode: 'cfb', 'cbc' or 'ctr'
+        salt: Salt (generated if None, except for CTR on 64-bit block backends)
+        backend: Block-cipher backend name (see BACKENDS)
+        fast: Use the backend's native CBC/CFB implementation when available
+    
+    Returns:
+        Container bytes
+    """
+    mode = mode.upper()
+    if mode not in _FUNCTIONS:
+        raise ValueError("Mode must be 'cfb', 'cbc' or 'ctr'")
+    if salt is None:
+        salt = generate_ctr_salt(backend) if mode == 'CTR' else generate_salt(backend=backend)
+    
+    encrypt = _FUNCTIONS[mode][0]
+    if mode == 'CTR':
+        ciphertext, salt = encrypt(plaintext, key, salt, backend=backend)
+    else:
+        ciphertext, salt = encrypt(plaintext, key, salt, backend=backend, fast=fast)
+    return pack_header(mode, backend, salt, len(plaintext)) + ciphertext
+
+
+def open_container(buffer, key, fast=False):
+    """
+    Decrypt a container using the mode, backend and salt in its header
+    
+    Args:
+        buffer: Container bytes, memoryview or mmap
+        key: Decryption key or keyring handle
+        fast: Use the backend's native CBC/CFB implementation when available
+    
+    Returns:
+        Decrypted plaintext
+    """
+    header, body = parse_container(buffer)
+    decrypt = _FUNCTIONS[header['mode']][1]
+    if header['mode'] == 'CTR':
+        plaintext = decrypt(body, key, header['salt'], backend=header['backend'])
+    else:
+        plaintext = decrypt(body, key, header['salt'], backend=header['backend'], fast=fast)
+    check_plaintext_length(header, len(plaintext))
+    return plaintext
@@ -0,0 +1,163 @@
+"""
+Multi-tenant keyring: key IDs mapped to ready-to-use cipher contexts
+Expanded contexts live in a bounded LRU cache so key setup is paid once per
+key and backend instead of once per message
+"""
+
+import threading
+from collections import OrderedDict
+from present_cipher import (
+    DEFAULT_BACKEND,
+    is_thread_safe, new_block_cipher
+)
+
+
+class KeyHandle:
+    """
+    Reference to a keyring entry, accepted by the mode functions in place
+    of raw key bytes
+    """
+    
+    __slots__ = ('keyring', 'key_id')
+    
+    def __init__(self, keyring, key_id):
+        self.keyring = keyring
+        self.key_id = key_id
+    
+    @property
+    def key(self):
+        """Raw key bytes (used by the native chaining ciphers)"""
+        return self.keyring.get_key(self.key_id)
+    
+    def block_cipher(self, backend=DEFAULT_BACKEND):
+        """Cached ECB context for this key and backend"""
+        return self.keyring.block_cipher(self.key_id, backend)
+    
+    def __repr__(self):
+        return f"KeyHandle({self.key_id!r})"
+
+
+class _PerThreadContext(threading.local):
+    """Lazily expanded cipher per thread, for a backend that is not thread safe"""
+    
+    def __init__(self, key):
+        # Runs again in every thread that touches the holder
+        self.key = key
+        self.cipher = None
+
+
+class Keyring:
+    """
+    Thread-safe map of key IDs to cached, expanded cipher contexts
+    
+    Contexts are kept per (key ID, backend) in an LRU cache of at most
+    `capacity` entries. Backends whose cipher objects are not thread safe
+    get one context per thread within an entry.
+    """
+    
+    def __init__(self, capacity=1024):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.capacity = capacity
+        self._keys = {}
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def add(self, key_id, key):
+        """Register (or replace) the raw key for key_id and return its handle"""
+        with self._lock:
+            self._keys[key_id] = bytes(key)
+            self._drop_contexts(key_id)
+        return KeyHandle(self, key_id)
+    
+    def remove(self, key_id):
+        """Forget a key and its cached contexts"""
+        with self._lock:
+            del self._keys[key_id]
+            self._drop_contexts(key_id)
+    
+    def _drop_contexts(self, key_id):
+        for entry in [entry for entry in self._contexts if entry[0] == key_id]:
+            del self._contexts[entry]
+    
+    def handle(self, key_id):
+        """Handle for a registered key, usable as the key of any mode function"""
+        self.get_key(key_id)
+        return KeyHandle(self, key_id)
+    
+    def get_key(self, key_id):
+        """Raw key bytes for key_id"""
+        try:
+            return self._keys[key_id]
+        except KeyError:
+            raise KeyError(f"Unknown key ID {key_id!r}") from None
+    
+    def __contains__(self, key_id):
+        return key_id in self._keys
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def _new_context(self, key, backend):
+        """Expanded cipher, or a per-thread holder for non-thread-safe backends"""
+        if is_thread_safe(backend):
+            return new_block_cipher(key, backend)
+        return _PerThreadContext(key)
+    
+    def block_cipher(self, key_id, backend=DEFAULT_BACKEND):
+        """
+        Return a ready-to-use ECB cipher for key_id, expanding it on a miss
+        
+        Args:
+            key_id: Registered key ID
+            backend: Block-cipher backend name
+        
+        Returns:
+            ECB cipher object with encrypt(data) and decrypt(data)
+        """
+        entry = (key_id, backend)
+        with self._lock:
+            context = self._contexts.get(entry)
+            if context is not None:
+                self._contexts.move_to_end(entry)
+                self.hits += 1
+            else:
+                key = self.get_key(key_id)
+        
+        if context is None:
+            # Key setup runs outside the lock so other tenants are not blocked
+            context = self._new_context(key, backend)
+            with self._lock:
+                self.misses += 1
+                existing = self._contexts.get(entry)
+                if existing is not None:
+                    context = existing
+                    self._contexts.move_to_end(entry)
+                elif self._keys.get(key_id) == key:
+                    self._contexts[entry] = context
+                    while len(self._contexts) > self.capacity:
+                        self._contexts.popitem(last=False)
+                        self.evictions += 1
+                # Otherwise the key was replaced or removed during setup: the
+                # context serves this call only and is never cached
+        
+        if isinstance(context, _PerThreadContext):
+            if context.cipher is None:
+                context.cipher = new_block_cipher(context.key, backend)
+            return context.cipher
+        return context
+    
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            return {
+                'keys': len(self._keys),
+                'contexts': len(self._contexts),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
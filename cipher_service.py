@@ -0,0 +1,508 @@
+"""
+Local encryption service
+A long-lived asyncio server on a Unix domain socket or localhost TCP, so
+callers pay interpreter startup and key setup once instead of per operation.
+Concurrent small CBC/CFB requests are coalesced into one encrypt_batch or
+decrypt_batch call; large requests run in a thread pool
+
+Wire protocol (integers big-endian), every message framed as
+    uint32 length | payload
+Request payload:
+    uint32 request_id | uint8 op | uint8 mode | uint8 key_len | key |
+    uint8 salt_len | salt | data
+Response payload:
+    uint32 request_id | uint8 status | uint8 salt_len | salt | data
+op is OP_ENCRYPT or OP_DECRYPT and mode an index into MODES. An empty salt
+on encrypt lets the server generate one, except for CTR on 64-bit block
+backends, whose nonces are too short to draw at random. On STATUS_ERROR,
+data is a UTF-8 error message. Responses may arrive out of order; match
+them by request_id
+"""
+
+import os
+import socket
+import struct
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from cipher_keyring import Keyring
+from present_cipher import (
+    BACKENDS,
+    DEFAULT_BACKEND,
+    get_block_size, ctr_nonce_size, generate_salt, generate_ctr_salt,
+    cfb_encrypt, cfb_decrypt,
+    cbc_encrypt, cbc_decrypt,
+    ctr_encrypt, ctr_decrypt,
+    encrypt_batch, decrypt_batch, iter_batch,
+    enable_metrics, metrics_exposition
+)
+
+
+OP_ENCRYPT = 1
+OP_DECRYPT = 2
+MODES = ('cfb', 'cbc', 'ctr')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+DEFAULT_PORT = 7465
+
+_FRAME = struct.Struct('>I')
+_REQUEST = struct.Struct('>IBB')
+_RESPONSE = struct.Struct('>IB')
+
+_FUNCTIONS = {
+    ('cfb', OP_ENCRYPT): cfb_encrypt,
+    ('cfb', OP_DECRYPT): cfb_decrypt,
+    ('cbc', OP_ENCRYPT): cbc_encrypt,
+    ('cbc', OP_DECRYPT): cbc_decrypt,
+    ('ctr', OP_ENCRYPT): ctr_encrypt,
+    ('ctr', OP_DECRYPT): ctr_decrypt,
+}
+
+
+def _frame(payload_parts):
+    payload = b''.join(payload_parts)
+    return _FRAME.pack(len(payload)) + payload
+
+
+def encode_request(request_id, op, mode, key, salt, data):
+    """Framed request bytes"""
+    return _frame([_REQUEST.pack(request_id, op, MODES.index(mode)),
+                   bytes([len(key)]), key, bytes([len(salt)]), salt, data])
+
+
+def parse_request(payload):
+    """
+    Split a request payload
+    
+    Returns:
+        Tuple of (request_id, op, mode, key, salt, data)
+    """
+    if len(payload) < _REQUEST.size + 2:
+        raise ValueError("Truncated request")
+    request_id, op, mode = _REQUEST.unpack_from(payload)
+    if op not in (OP_ENCRYPT, OP_DECRYPT):
+        raise ValueError(f"Unknown operation {op}")
+    if mode >= len(MODES):
+        raise ValueError(f"Unknown mode {mode}")
+    
+    view = memoryview(payload)
+    pos = _REQUEST.size
+    key = bytes(view[pos + 1:pos + 1 + payload[pos]])
+    pos += 1 + len(key)
+    if pos >= len(payload):
+        raise ValueError("Truncated request")
+    salt = bytes(view[pos + 1:pos + 1 + payload[pos]])
+    pos += 1 + len(salt)
+    if pos > len(payload):
+        raise ValueError("Truncated request")
+    return request_id, op, MODES[mode], key, salt, view[pos:]
+
+
+def encode_response(request_id, status, salt, data):
+    """Framed response bytes"""
+    return _frame([_RESPONSE.pack(request_id, status), bytes([len(salt)]), salt, data])
+
+
+def parse_response(payload):
+    """
+    Split a response payload
+    
+    Returns:
+        Tuple of (request_id, status, salt, data)
+    """
+    request_id, status = _RESPONSE.unpack_from(payload)
+    pos = _RESPONSE.size
+    salt = payload[pos + 1:pos + 1 + payload[pos]]
+    return request_id, status, salt, payload[pos + 1 + len(salt):]
+
+
+class CipherService:
+    """
+    asyncio encryption server
+    
+    Backpressure: each connection stops reading once max_inflight of its
+    requests are unanswered, at most max_executor_jobs large requests run
+    at once, frames above max_frame_size are refused, connections beyond
+    max_connections are closed on accept, and at most max_keys idle client
+    keys stay registered.
+    """
+    
+    def __init__(self, backend=DEFAULT_BACKEND, fast=False, batch_threshold=4096,
+                 max_batch=1024, batch_delay=0.0005, max_frame_size=64 * 1024 * 1024,
+                 max_inflight=64, max_connections=256, max_executor_jobs=None, workers=None,
+                 max_keys=1024):
+        """
+        Args:
+            backend: Block-cipher backend name (see BACKENDS)
+            fast: Use the native CBC/CFB implementation for large requests
+            batch_threshold: Largest CBC/CFB request (bytes) that is coalesced
+            max_batch: Requests per batch before it is flushed early
+            batch_delay: Seconds a batch waits for more requests
+            max_frame_size: Largest accepted request frame in bytes
+            max_inflight: Unanswered requests per connection
+            max_connections: Concurrent client connections
+            max_executor_jobs: Large requests processed at once
+            workers: Thread pool size (default: CPU count based)
+            max_keys: Idle client keys kept registered (least recently used
+                      beyond this are forgotten with their contexts)
+        """
+        self.backend = backend
+        self.fast = fast
+        self.block_size = get_block_size(backend)
+        self.batch_threshold = batch_threshold
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.max_frame_size = max_frame_size
+        self.max_inflight = max_inflight
+        self.max_connections = max_connections
+        self.max_keys = max_keys
+        self.keyring = Keyring()
+        # Registered client keys, least recently used first, with the
+        # number of their requests in flight
+        self._key_users = OrderedDict()
+        workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._executor_slots = asyncio.Semaphore(max_executor_jobs or workers)
+        self._batches = {}
+        self._connections = 0
+        self.stats = {
+            'connections': 0, 'rejected_connections': 0, 'requests': 0,
+            'errors': 0, 'batches': 0, 'batched_requests': 0, 'executor_requests': 0,
+            'evicted_keys': 0,
+        }
+    
+    def _acquire_key(self, key):
+        """
+        Keyring handle for key, validating it against the backend on first use
+        
+        The key stays registered until its request calls _release_key; only
+        idle keys are ever evicted.
+        """
+        if key in self._key_users:
+            self._key_users.move_to_end(key)
+        else:
+            handle = self.keyring.add(key, key)
+            try:
+                handle.block_cipher(self.backend)
+            except Exception:
+                self.keyring.remove(key)
+                raise
+            self._key_users[key] = 0
+        self._key_users[key] += 1
+        self._evict_keys()
+        return self.keyring.handle(key)
+    
+    def _release_key(self, key):
+        self._key_users[key] -= 1
+        self._evict_keys()
+    
+    def _evict_keys(self):
+        """Forget the least recently used idle keys beyond max_keys"""
+        excess = len(self._key_users) - self.max_keys
+        if excess <= 0:
+            return
+        for key in [key for key, users in self._key_users.items() if not users][:excess]:
+            del self._key_users[key]
+            self.keyring.remove(key)
+            self.stats['evicted_keys'] += 1
+    
+    def _check(self, op, mode, salt, data):
+        """Reject requests that would fail, before they can join a batch"""
+        salt_size = ctr_nonce_size(self.backend) if mode == 'ctr' else self.block_size
+        if len(salt) != salt_size:
+            raise ValueError(f"Salt must be {salt_size} bytes for {mode.upper()} mode")
+        if op == OP_DECRYPT and mode == 'cbc' and len(data) % self.block_size:
+            raise ValueError("Data must be aligned to block boundary in CBC mode")
+    
+    def _run(self, op, mode, handle, salt, data):
+        """Process one request directly; returns (salt, result)"""
+        function = _FUNCTIONS[mode, op]
+        if mode == 'ctr':
+            result = function(data, handle, salt, backend=self.backend)
+        else:
+            result = function(data, handle, salt, backend=self.backend, fast=self.fast)
+        return salt, result[0] if op == OP_ENCRYPT else result
+    
+    def _enqueue(self, op, mode, key, handle, salt, data):
+        """Add a small request to the pending batch for its op, mode and key"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = (op, mode, key)
+        pending = self._batches.get(group)
+        if pending is None:
+            pending = self._batches[group] = (handle, [])
+            loop.call_later(self.batch_delay, self._flush, group)
+        pending[1].append((data, salt, future))
+        if len(pending[1]) >= self.max_batch:
+            self._flush(group)
+        return future
+    
+    def _flush(self, group):
+        """Run a pending batch through the block engine in one call"""
+        pending = self._batches.pop(group, None)
+        if pending is None:
+            return
+        (op, mode, _), (handle, requests) = group, pending
+        
+        try:
+            if op == OP_ENCRYPT:
+                buffer, offsets, _ = encrypt_batch([data for data, _, _ in requests], handle,
+                                                   [salt for _, salt, _ in requests],
+                                                   mode=mode, backend=self.backend)
+            else:
+                buffer, offsets = decrypt_batch([(data, salt) for data, salt, _ in requests],
+                                                handle, mode=mode, backend=self.backend)
+            self.stats['batches'] += 1
+            self.stats['batched_requests'] += len(requests)
+            for (_, _, future), result in zip(requests, iter_batch(buffer, offsets)):
+                if not future.done():
+                    future.set_result(bytes(result))
+        except Exception as e:
+            # Every waiting request gets an answer, whatever went wrong
+            message = str(e) if isinstance(e, ValueError) else f"Batch failed: {type(e).__name__}: {e}"
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(ValueError(message))
+    
+    async def _dispatch(self, op, mode, key, salt, data):
+        if op == OP_ENCRYPT and not salt:
+            salt = generate_ctr_salt(self.backend) if mode == 'ctr' else generate_salt(self.block_size)
+        self._check(op, mode, salt, data)
+        handle = self._acquire_key(key)
+        
+        try:
+            if len(data) > self.batch_threshold:
+                async with self._executor_slots:
+                    self.stats['executor_requests'] += 1
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self.executor, self._run, op, mode,
+                                                      handle, salt, bytes(data))
+            if mode == 'ctr':
+                # No chaining to batch: small CTR requests are cheap enough inline
+                return self._run(op, mode, handle, salt, data)
+            return salt, await self._enqueue(op, mode, key, handle, salt, data)
+        finally:
+            self._release_key(key)
+    
+    async def _process(self, payload):
+        """Response frame for one request frame"""
+        self.stats['requests'] += 1
+        request_id = _FRAME.unpack_from(payload)[0] if len(payload) >= 4 else 0
+        try:
+            request_id, op, mode, key, salt, data = parse_request(payload)
+            salt, result = await self._dispatch(op, mode, key, salt, data)
+            return encode_response(request_id, STATUS_OK, salt, result)
+        except ValueError as e:
+            self.stats['errors'] += 1
+            return encode_response(request_id, STATUS_ERROR, b'', str(e).encode())
+        except Exception as e:
+            # Never leave the client waiting for a response
+            self.stats['errors'] += 1
+            return encode_response(request_id, STATUS_ERROR, b'',
+                                   f"Internal error: {type(e).__name__}: {e}".encode())
+    
+    async def _serve(self, payload, writer, write_lock, inflight):
+        try:
+            response = await self._process(payload)
+            async with write_lock:
+                writer.write(response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            inflight.release()
+    
+    async def handle_connection(self, reader, writer):
+        """Read framed requests from one client until it disconnects"""
+        if self._connections >= self.max_connections:
+            self.stats['rejected_connections'] += 1
+            writer.close()
+            return
+        self._connections += 1
+        self.stats['connections'] += 1
+        
+        inflight = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                (length,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+                if length > self.max_frame_size:
+                    # The stream cannot be resynchronised: report and hang up
+                    async with write_lock:
+                        writer.write(encode_response(0, STATUS_ERROR, b'',
+                                                     f"Frame of {length} bytes exceeds the limit".encode()))
+                        await writer.drain()
+                    break
+                payload = await reader.readexactly(length)
+                
+                # Stop reading (and let the socket buffers fill) while this
+                # connection has max_inflight unanswered requests
+                await inflight.acquire()
+                task = asyncio.create_task(self._serve(payload, writer, write_lock, inflight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self._connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+    
+    def metrics_text(self):
+        """Cipher metrics plus the service counters, in the Prometheus text format"""
+        cipher_metrics = metrics_exposition()
+        lines = [cipher_metrics.rstrip('\n')] if cipher_metrics else []
+        for name, value in self.stats.items():
+            lines.append(f"# TYPE saltedcipher_service_{name}_total counter")
+            lines.append(f"saltedcipher_service_{name}_total {value}")
+        lines.append("# TYPE saltedcipher_service_open_connections gauge")
+        lines.append(f"saltedcipher_service_open_connections {self._connections}")
+        return '\n'.join(lines) + '\n'
+    
+    async def handle_metrics(self, reader, writer):
+        """Answer one HTTP GET with the metrics text, for scrapers"""
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            if request.startswith(b'GET '):
+                status, body = '200 OK', self.metrics_text().encode()
+            else:
+                status, body = '405 Method Not Allowed', b''
+            writer.write(f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self, path=None, host='127.0.0.1', port=DEFAULT_PORT, metrics_port=None):
+        """
+        Serve on a Unix domain socket if path is given, else on TCP
+        
+        With metrics_port, metrics_text() is also served over HTTP on
+        localhost for scraping (enable_metrics() turns on the cipher counters)
+        """
+        limit = self.max_frame_size + _FRAME.size
+        if path:
+            server = await asyncio.start_unix_server(self.handle_connection, path=path, limit=limit)
+            # Requests carry raw keys: only the owner may connect
+            os.chmod(path, 0o600)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=limit)
+        metrics_server = None
+        if metrics_port is not None:
+            metrics_server = await asyncio.start_server(self.handle_metrics, '127.0.0.1', metrics_port)
+        
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if metrics_server is not None:
+                metrics_server.close()
+            self.executor.shutdown(wait=False)
+
+
+class CipherClient:
+    """Blocking client for the encryption service, one request at a time"""
+    
+    def __init__(self, path=None, host='127.0.0.1', port=DEFAULT_PORT, timeout=None):
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+        self._request_id = 0
+    
+    def _recv_exactly(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if not count:
+                raise ConnectionError("Service closed the connection")
+            received += count
+        return bytes(buffer)
+    
+    def _call(self, op, mode, key, salt, data):
+        self._request_id = (self._request_id + 1) & 0xFFFFFFFF
+        self.sock.sendall(encode_request(self._request_id, op, mode, key, salt, data))
+        (length,) = _FRAME.unpack(self._recv_exactly(_FRAME.size))
+        request_id, status, salt, result = parse_response(self._recv_exactly(length))
+        if status != STATUS_OK:
+            raise ValueError(result.decode())
+        if request_id != self._request_id:
+            raise ValueError(f"Response for request {request_id}, expected {self._request_id}")
+        return salt, result
+    
+    def encrypt(self, data, key, mode='cbc', salt=b''):
+        """
+        Encrypt data on the service
+        
+        Returns:
+            Tuple of (ciphertext, salt)
+        """
+        salt, result = self._call(OP_ENCRYPT, mode, key, salt, data)
+        return result, salt
+    
+    def decrypt(self, data, key, salt, mode='cbc'):
+        """Decrypt data on the service"""
+        return self._call(OP_DECRYPT, mode, key, salt, data)[1]
+    
+    def close(self):
+        self.sock.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local salted-cipher encryption service")
+    parser.add_argument('--socket', help='Unix domain socket path (default: TCP on --host/--port)')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port (default: {DEFAULT_PORT})')
+    parser.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND, help=f'Block cipher backend (default: {DEFAULT_BACKEND})')
+    parser.add_argument('--fast', action='store_true', help="Use the backend's native CBC/CFB implementation for large requests")
+    parser.add_argument('--batch-threshold', type=int, default=4096, help='Largest request in bytes coalesced into batches (default: 4096)')
+    parser.add_argument('--max-batch', type=int, default=1024, help='Requests per batch (default: 1024)')
+    parser.add_argument('--batch-delay', type=float, default=0.5, help='Milliseconds a batch waits for more requests (default: 0.5)')
+    parser.add_argument('--max-frame-size', type=int, default=64 * 1024 * 1024, help='Largest request frame in bytes (default: 64 MiB)')
+    parser.add_argument('--max-inflight', type=int, default=64, help='Unanswered requests per connection (default: 64)')
+    parser.add_argument('--max-connections', type=int, default=256, help='Concurrent connections (default: 256)')
+    parser.add_argument('--workers', type=int, help='Thread pool size for large requests')
+    parser.add_argument('--max-keys', type=int, default=1024, help='Idle client keys kept registered (default: 1024)')
+    parser.add_argument('--metrics-port', type=int, help='Serve cipher and service metrics over HTTP on this localhost port')
+    args = parser.parse_args()
+    if args.metrics_port is not None:
+        enable_metrics()
+    
+    service = CipherService(backend=args.backend, fast=args.fast, batch_threshold=args.batch_threshold,
+                            max_batch=args.max_batch, batch_delay=args.batch_delay / 1000,
+                            max_frame_size=args.max_frame_size, max_inflight=args.max_inflight,
+                            max_connections=args.max_connections, workers=args.workers,
+                            max_keys=args.max_keys)
+    where = args.socket or f"{args.host}:{args.port}"
+    print(f"Serving {args.backend} encryption on {where}")
+    if args.metrics_port is not None:
+        print(f"Metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    try:
+        asyncio.run(service.serve(path=args.socket, host=args.host, port=args.port,
+                                  metrics_port=args.metrics_port))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+
+if __name__ == "__main__":
+    main()
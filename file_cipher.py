@@ -0,0 +1,642 @@
+"""
+File encryption for the salted CBC/CFB modes
+Memory-mapped whole-file processing, where the block engine reads and writes
+the mappings through memoryviews, a segmented container whose segments
+encrypt and decrypt in parallel worker processes, a seekable reader that
+decrypts only the blocks each read covers, and thread-pool processing of
+whole directory trees
+"""
+
+import io
+import os
+import mmap
+import time
+import shutil
+import struct
+import fnmatch
+import threading
+from contextlib import contextmanager
+from Crypto.Util.Padding import unpad
+from present_cipher import (
+    DEFAULT_BACKEND,
+    get_block_size, new_block_cipher, generate_salt, xor_bytes,
+    cfb_encrypt, cfb_decrypt,
+    cbc_encrypt, cbc_decrypt,
+    ctr_xor_into,
+    SaltedEncryptor, SaltedDecryptor
+)
+from cipher_container import HEADER_SIZE, pack_header, parse_header, check_plaintext_length
+
+# Bytes handed to the block engine per step (a multiple of every block size)
+MMAP_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+@contextmanager
+def _mapped(f, size, writable):
+    """Yield a memoryview over the first size bytes of an open file"""
+    if size == 0:
+        # Zero-length files cannot be mapped
+        yield memoryview(bytearray())
+        return
+    
+    access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+    mapping = mmap.mmap(f.fileno(), size, access=access)
+    view = memoryview(mapping)
+    try:
+        yield view
+    finally:
+        view.release()
+        mapping.close()
+
+
+def _same_file(src_path, dst_path):
+    """True if dst_path is an existing path to the same file as src_path"""
+    return os.path.exists(dst_path) and os.path.samefile(src_path, dst_path)
+
+
+def _process_range(update_into, source, target, length):
+    """Feed the first length bytes of source through update_into, chunk by chunk"""
+    for start in range(0, length, MMAP_CHUNK_SIZE):
+        end = min(start + MMAP_CHUNK_SIZE, length)
+        update_into(source[start:end], target[start:end])
+
+
+def encrypt_file(src_path, dst_path, mode, key, salt, backend=DEFAULT_BACKEND, fast=False, offset=0):
+    """
+    Encrypt a file through memory mappings
+    
+    Args:
+        src_path: Plaintext file
+        dst_path: Ciphertext file, or None (or src_path itself) to encrypt
+                  src_path in place
+        mode: 'cfb' or 'cbc'
+        key: Encryption key
+        salt: Salt used as IV (one block of the backend)
+        backend: Block-cipher backend name
+        fast: Use the backend's native CBC/CFB implementation when available
+        offset: Bytes to leave free before the ciphertext, e.g. for a
+                container header
+    
+    Returns:
+        Size of the ciphertext in bytes
+    """
+    encryptor = SaltedEncryptor(mode, key, salt, backend=backend, fast=fast)
+    block_size = encryptor.block_size
+    size = os.path.getsize(src_path)
+    body = size - size % block_size
+    out_size = body + block_size  # Padding always adds 1 to block_size bytes
+    
+    if dst_path is not None and _same_file(src_path, dst_path):
+        # Opening the output would truncate the input before it is read
+        dst_path = None
+    if dst_path is None:
+        with open(src_path, 'r+b') as f:
+            f.seek(body)
+            tail = f.read()
+            f.truncate(offset + out_size)
+            with _mapped(f, offset + out_size, writable=True) as mapped, \
+                    mapped[offset:] as view:
+                if offset:
+                    # Move the plaintext up; overlapping copies are memmoves
+                    view[:body] = mapped[:body]
+                _process_range(encryptor.update_into, view, view, body)
+                view[body:] = encryptor.update(tail) + encryptor.finalize()
+        return out_size
+    
+    with open(src_path, 'rb') as src, open(dst_path, 'w+b') as dst:
+        dst.truncate(offset + out_size)
+        with _mapped(src, size, writable=False) as source, \
+                _mapped(dst, offset + out_size, writable=True) as mapped, \
+                mapped[offset:] as target:
+            _process_range(encryptor.update_into, source, target, body)
+            target[body:] = encryptor.update(source[body:]) + encryptor.finalize()
+    return out_size
+
+
+def decrypt_file(src_path, dst_path, mode, key, salt, backend=DEFAULT_BACKEND, fast=False, offset=0):
+    """
+    Decrypt a file through memory mappings
+    
+    Args:
+        src_path: Ciphertext file
+        dst_path: Plaintext file, or None (or src_path itself) to decrypt
+                  src_path in place
+        mode: 'cfb' or 'cbc'
+        key: Decryption key
+        salt: Salt used as IV (one block of the backend)
+        backend: Block-cipher backend name
+        fast: Use the backend's native CBC/CFB implementation when available
+        offset: Bytes before the ciphertext to skip, e.g. a container header
+    
+    Returns:
+        Size of the plaintext in bytes
+    """
+    decryptor = SaltedDecryptor(mode, key, salt, backend=backend, fast=fast)
+    block_size = decryptor.block_size
+    size = os.path.getsize(src_path) - offset
+    if decryptor.mode == 'CBC' and size % block_size:
+        # Fail before anything is overwritten
+        raise ValueError("Ciphertext length must be a multiple of the block size")
+    
+    # The final (possibly partial) block is decrypted last to strip its padding
+    body = (size - 1) // block_size * block_size if size else 0
+    
+    if dst_path is not None and _same_file(src_path, dst_path):
+        # Opening the output would truncate the input before it is read
+        dst_path = None
+    if dst_path is None:
+        with open(src_path, 'r+b') as f:
+            with _mapped(f, offset + size, writable=True) as mapped, \
+                    mapped[offset:] as view:
+                _process_range(decryptor.update_into, view, view, body)
+                last = decryptor.update(view[body:]) + decryptor.finalize()
+                view[body:body + len(last)] = last
+                if offset:
+                    # Move the plaintext down over the skipped bytes
+                    mapped[:body + len(last)] = view[:body + len(last)]
+            f.truncate(body + len(last))
+        return body + len(last)
+    
+    with open(src_path, 'rb') as src, open(dst_path, 'w+b') as dst:
+        dst.truncate(size)
+        with _mapped(src, offset + size, writable=False) as mapped, \
+                mapped[offset:] as source, \
+                _mapped(dst, size, writable=True) as target:
+            _process_range(decryptor.update_into, source, target, body)
+            last = decryptor.update(source[body:]) + decryptor.finalize()
+            target[body:body + len(last)] = last
+        dst.truncate(body + len(last))
+    return body + len(last)
+
+
+def encrypt_container_file(src_path, dst_path, mode, key, salt, backend=DEFAULT_BACKEND, fast=False):
+    """
+    Encrypt a file into a container (see cipher_container) through memory mappings
+    
+    Args:
+        src_path: Plaintext file
+        dst_path: Container file, or None (or src_path itself) to encrypt
+                  src_path in place
+        mode: 'cfb' or 'cbc'
+        key: Encryption key
+        salt: Salt used as IV (one block of the backend)
+        backend: Block-cipher backend name
+        fast: Use the backend's native CBC/CFB implementation when available
+    
+    Returns:
+        Size of the container in bytes
+    """
+    size = os.path.getsize(src_path)
+    header = pack_header(mode, backend, salt, size)
+    out_size = encrypt_file(src_path, dst_path, mode, key, salt, backend=backend, fast=fast,
+                            offset=HEADER_SIZE)
+    with open(dst_path or src_path, 'r+b') as f:
+        f.write(header)
+    return HEADER_SIZE + out_size
+
+
+def decrypt_container_file(src_path, dst_path, key, fast=False):
+    """
+    Decrypt a container file (see cipher_container) through memory mappings
+    
+    The mode, backend and salt come from the container header.
+    
+    Args:
+        src_path: Container file
+        dst_path: Plaintext file, or None (or src_path itself) to decrypt
+                  src_path in place
+        key: Decryption key or keyring handle
+        fast: Use the backend's native CBC/CFB implementation when available
+    
+    Returns:
+        Size of the plaintext in bytes
+    """
+    with open(src_path, 'rb') as src:
+        header = parse_header(src.read(HEADER_SIZE))
+    
+    if header['mode'] == 'CTR' and (dst_path is None or _same_file(src_path, dst_path)):
+        size = os.path.getsize(src_path) - HEADER_SIZE
+        with open(src_path, 'r+b') as f:
+            with _mapped(f, HEADER_SIZE + size, writable=True) as mapped, \
+                    mapped[HEADER_SIZE:] as view:
+                ctr_xor_into(view, key, header['salt'], backend=header['backend'])
+                mapped[:size] = view
+            f.truncate(size)
+    elif header['mode'] == 'CTR':
+        with open(src_path, 'rb') as src, open(dst_path, 'w+b') as dst:
+            src.seek(HEADER_SIZE)
+            shutil.copyfileobj(src, dst)
+            size = dst.tell()
+            with _mapped(dst, size, writable=True) as view:
+                ctr_xor_into(view, key, header['salt'], backend=header['backend'])
+    else:
+        size = decrypt_file(src_path, dst_path, header['mode'], key, header['salt'],
+                            backend=header['backend'], fast=fast, offset=HEADER_SIZE)
+    
+    check_plaintext_length(header, size)
+    return size
+
+
+# Segmented container: independently chained segments for multi-process use
+#
+#   magic (5) | version (1) | mode (1) | backend length (1) | backend
+#   salt length (1) | file salt | segment size (8) | plaintext size (8)
+#   segment count (4) | index of (offset (8), length (8)) per segment
+#   segment ciphertexts
+SEGMENT_MAGIC = b'SCSEG'
+SEGMENT_VERSION = 1
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024
+_SEGMENT_MODES = {'CFB': 0, 'CBC': 1}
+_SEGMENT_FIELDS = struct.Struct('>QQI')
+_SEGMENT_ENTRY = struct.Struct('>QQ')
+
+
+def derive_segment_salt(key, file_salt, index, backend=DEFAULT_BACKEND):
+    """Derive a segment's salt by encrypting the file salt XOR the segment index"""
+    block_size = get_block_size(backend)
+    counter = index.to_bytes(block_size, 'big')
+    return new_block_cipher(key, backend).encrypt(xor_bytes(file_salt, counter))
+
+
+def _write_segment_header(f, mode, backend, file_salt, segment_size, plaintext_size, index):
+    name = backend.encode('ascii')
+    f.write(SEGMENT_MAGIC + bytes([SEGMENT_VERSION, _SEGMENT_MODES[mode], len(name)]) + name)
+    f.write(bytes([len(file_salt)]) + file_salt)
+    f.write(_SEGMENT_FIELDS.pack(segment_size, plaintext_size, len(index)))
+    for offset, length in index:
+        f.write(_SEGMENT_ENTRY.pack(offset, length))
+
+
+def _segment_header_size(backend, file_salt, count):
+    return (len(SEGMENT_MAGIC) + 3 + len(backend) + 1 + len(file_salt) +
+            _SEGMENT_FIELDS.size + count * _SEGMENT_ENTRY.size)
+
+
+def read_segment_header(f):
+    """
+    Parse the header of a segmented container
+    
+    Returns:
+        Dict with mode, backend, salt, segment_size, plaintext_size and
+        index (list of (offset, length) of each segment's ciphertext)
+    """
+    start = f.read(len(SEGMENT_MAGIC) + 3)
+    if len(start) < len(SEGMENT_MAGIC) + 3 or start[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+        raise ValueError("Not a segmented SaltedCipher container")
+    version, mode_id, name_length = start[len(SEGMENT_MAGIC):]
+    if version != SEGMENT_VERSION:
+        raise ValueError(f"Unsupported container version {version}")
+    modes = {v: k for k, v in _SEGMENT_MODES.items()}
+    if mode_id not in modes:
+        raise ValueError(f"Unknown mode id {mode_id}")
+    
+    backend = f.read(name_length).decode('ascii')
+    salt = f.read(f.read(1)[0])
+    segment_size, plaintext_size, count = _SEGMENT_FIELDS.unpack(f.read(_SEGMENT_FIELDS.size))
+    index = [_SEGMENT_ENTRY.unpack(f.read(_SEGMENT_ENTRY.size)) for _ in range(count)]
+    return {
+        'mode': modes[mode_id],
+        'backend': backend,
+        'salt': salt,
+        'segment_size': segment_size,
+        'plaintext_size': plaintext_size,
+        'index': index,
+    }
+
+
+def _encrypt_segment(job):
+    """Worker: encrypt one plaintext segment into its slot in the container"""
+    src_path, dst_path, mode, key, salt, backend, fast, src_offset, length, dst_offset = job
+    with open(src_path, 'rb') as src:
+        src.seek(src_offset)
+        data = src.read(length)
+    encrypt = cbc_encrypt if mode == 'CBC' else cfb_encrypt
+    ciphertext, _ = encrypt(data, key, salt, backend=backend, fast=fast)
+    with open(dst_path, 'r+b') as dst:
+        dst.seek(dst_offset)
+        dst.write(ciphertext)
+    return len(ciphertext)
+
+
+def _decrypt_segment(job):
+    """Worker: decrypt one container segment into its slot in the plaintext file"""
+    src_path, dst_path, mode, key, salt, backend, fast, src_offset, length, dst_offset, expected = job
+    with open(src_path, 'rb') as src:
+        src.seek(src_offset)
+        data = src.read(length)
+    decrypt = cbc_decrypt if mode == 'CBC' else cfb_decrypt
+    plaintext = decrypt(data, key, salt, backend=backend, fast=fast)
+    if len(plaintext) != expected:
+        # Never spill into the next segment's slot
+        raise ValueError("Segment size does not match the container header (wrong key?)")
+    with open(dst_path, 'r+b') as dst:
+        dst.seek(dst_offset)
+        dst.write(plaintext)
+    return len(plaintext)
+
+
+def _run_jobs(worker, jobs, workers):
+    """Run segment jobs inline or across a process pool"""
+    if workers == 1 or len(jobs) <= 1:
+        return [worker(job) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(worker, jobs))
+
+
+def encrypt_file_segmented(src_path, dst_path, mode, key, salt=None, backend=DEFAULT_BACKEND,
+                           fast=False, segment_size=DEFAULT_SEGMENT_SIZE, workers=None):
+    """
+    Encrypt a file into a segmented container, one process per segment
+    
+    Args:
+        src_path: Plaintext file
+        dst_path: Container file to create
+        mode: 'cfb' or 'cbc'
+        key: Encryption key or keyring handle
+        salt: Per-file salt (generated if None); segment salts derive from it
+        backend: Block-cipher backend name
+        fast: Use the backend's native CBC/CFB implementation when available
+        segment_size: Plaintext bytes per segment (multiple of the block size)
+        workers: Worker processes (defaults to the CPU count)
+    
+    Returns:
+        The container header as returned by read_segment_header
+    """
+    mode = mode.upper()
+    if mode not in _SEGMENT_MODES:
+        raise ValueError("Mode must be 'cfb' or 'cbc'")
+    block_size = get_block_size(backend)
+    if segment_size <= 0 or segment_size % block_size:
+        raise ValueError(f"Segment size must be a positive multiple of {block_size} bytes")
+    if salt is None:
+        salt = generate_salt(backend=backend)
+    if len(salt) != block_size:
+        raise ValueError(f"Salt must be {block_size} bytes for {mode} mode")
+    
+    if _same_file(src_path, dst_path):
+        raise ValueError("The container cannot overwrite its own plaintext file")
+    
+    plaintext_size = os.path.getsize(src_path)
+    count = -(-plaintext_size // segment_size)
+    
+    # Every segment is padded on its own, so all offsets are known upfront
+    index = []
+    offset = _segment_header_size(backend, salt, count)
+    for i in range(count):
+        length = min(segment_size, plaintext_size - i * segment_size)
+        cipher_length = length - length % block_size + block_size
+        index.append((offset, cipher_length))
+        offset += cipher_length
+    
+    with open(dst_path, 'wb') as dst:
+        _write_segment_header(dst, mode, backend, salt, segment_size, plaintext_size, index)
+        dst.truncate(offset)
+    
+    # Keyring handles cannot be pickled for worker processes: jobs carry the raw key
+    job_key = getattr(key, 'key', key)
+    jobs = [
+        (src_path, dst_path, mode, job_key, derive_segment_salt(key, salt, i, backend), backend, fast,
+         i * segment_size, min(segment_size, plaintext_size - i * segment_size), index[i][0])
+        for i in range(count)
+    ]
+    _run_jobs(_encrypt_segment, jobs, workers or os.cpu_count())
+    
+    return {
+        'mode': mode,
+        'backend': backend,
+        'salt': salt,
+        'segment_size': segment_size,
+        'plaintext_size': plaintext_size,
+        'index': index,
+    }
+
+
+def decrypt_file_segmented(src_path, dst_path, key, fast=False, workers=None):
+    """
+    Decrypt a segmented container, one process per segment
+    
+    Args:
+        src_path: Container file
+        dst_path: Plaintext file to create
+        key: Decryption key or keyring handle
+        fast: Use the backend's native CBC/CFB implementation when available
+        workers: Worker processes (defaults to the CPU count)
+    
+    Returns:
+        Size of the plaintext in bytes
+    """
+    if _same_file(src_path, dst_path):
+        raise ValueError("The plaintext cannot overwrite its own container file")
+    with open(src_path, 'rb') as src:
+        header = read_segment_header(src)
+    
+    with open(dst_path, 'wb') as dst:
+        dst.truncate(header['plaintext_size'])
+    
+    mode, backend, segment_size = header['mode'], header['backend'], header['segment_size']
+    plaintext_size = header['plaintext_size']
+    job_key = getattr(key, 'key', key)
+    jobs = [
+        (src_path, dst_path, mode, job_key, derive_segment_salt(key, header['salt'], i, backend), backend, fast,
+         offset, length, i * segment_size, min(segment_size, plaintext_size - i * segment_size))
+        for i, (offset, length) in enumerate(header['index'])
+    ]
+    return sum(_run_jobs(_decrypt_segment, jobs, workers or os.cpu_count()))
+
+
+class SaltedReader(io.RawIOBase):
+    """
+    Seekable, read-only plaintext view of a salted CBC/CFB ciphertext file
+    
+    Each read decrypts only the blocks it covers plus the one ciphertext
+    block before them, so small slices of large files stay cheap. Wrap it
+    in io.BufferedReader for buffered access.
+    """
+    
+    def __init__(self, source, mode, key, salt, backend=DEFAULT_BACKEND):
+        """
+        Args:
+            source: Path or seekable binary file object holding the ciphertext
+            mode: 'cfb' or 'cbc'
+            key: Decryption key
+            salt: Salt used as IV (one block of the backend)
+            backend: Block-cipher backend name
+        """
+        super().__init__()
+        self.mode = mode.upper()
+        if self.mode not in ('CFB', 'CBC'):
+            raise ValueError("Mode must be 'cfb' or 'cbc'")
+        self.block_size = get_block_size(backend)
+        if len(salt) != self.block_size:
+            raise ValueError(f"Salt must be {self.block_size} bytes for {self.mode} mode")
+        self.salt = salt
+        self.cipher = new_block_cipher(key, backend)
+        
+        self._owns_raw = isinstance(source, (str, bytes, os.PathLike))
+        self._raw = open(source, 'rb') if self._owns_raw else source
+        self._cipher_size = self._raw.seek(0, io.SEEK_END)
+        self._pos = 0
+        self._size = self._plaintext_size()
+    
+    def _read_at(self, offset, length):
+        self._raw.seek(offset)
+        return self._raw.read(length)
+    
+    def _decrypt_range(self, first, last):
+        """Decrypt ciphertext blocks first..last-1 using only the block before first"""
+        bs = self.block_size
+        previous = self.salt if first == 0 else self._read_at((first - 1) * bs, bs)
+        data = self._read_at(first * bs, (last - first) * bs)
+        num_blocks = -(-len(data) // bs)
+        shifted = previous + data[:(num_blocks - 1) * bs]
+        if self.mode == 'CBC':
+            return xor_bytes(self.cipher.decrypt(data), shifted)
+        return xor_bytes(data, self.cipher.encrypt(shifted))
+    
+    def _plaintext_size(self):
+        """Plaintext length, following cbc_decrypt/cfb_decrypt padding rules"""
+        bs = self.block_size
+        size = self._cipher_size
+        if size % bs:
+            if self.mode == 'CBC':
+                raise ValueError("Ciphertext length must be a multiple of the block size")
+            return size  # Truncated CFB data has no padding to strip
+        if size == 0:
+            return 0
+        last = self._decrypt_range(size // bs - 1, size // bs)
+        try:
+            return size - bs + len(unpad(last, bs))
+        except ValueError:
+            # Invalid padding: the raw plaintext is returned, as in the modes
+            return size
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._pos = position
+        return position
+    
+    def tell(self):
+        return self._pos
+    
+    def readinto(self, b):
+        """Decrypt the blocks covering the next len(b) bytes into b"""
+        n = min(len(b), self._size - self._pos)
+        if n <= 0:
+            return 0
+        bs = self.block_size
+        first = self._pos // bs
+        last = -(-(self._pos + n) // bs)
+        plaintext = self._decrypt_range(first, last)
+        offset = self._pos - first * bs
+        b[:n] = plaintext[offset:offset + n]
+        self._pos += n
+        return n
+    
+    def close(self):
+        if not self.closed and self._owns_raw:
+            self._raw.close()
+        super().close()
+
+
+def _iter_tree(src_root, dst_root, pattern):
+    """Yield (source, mirror destination) for every matching file, lazily"""
+    src_root = os.path.abspath(src_root)
+    dst_root = os.path.abspath(dst_root)
+    for dirpath, dirnames, filenames in os.walk(src_root):
+        # Never descend into the output tree when it lives inside the input
+        dirnames[:] = sorted(d for d in dirnames if os.path.join(dirpath, d) != dst_root)
+        target_dir = os.path.join(dst_root, os.path.relpath(dirpath, src_root))
+        for name in sorted(filenames):
+            if fnmatch.fnmatch(name, pattern):
+                yield os.path.join(dirpath, name), os.path.join(target_dir, name)
+
+
+def _process_tree_file(action, src_path, dst_path, mode, key, backend, fast, segment_size):
+    """Encrypt or decrypt one file of a tree; returns (bytes in, bytes out)"""
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    if action == 'encrypt':
+        encrypt_file_segmented(src_path, dst_path, mode, key, backend=backend, fast=fast,
+                               segment_size=segment_size, workers=1)
+    else:
+        decrypt_file_segmented(src_path, dst_path, key, fast=fast, workers=1)
+    return os.path.getsize(src_path), os.path.getsize(dst_path)
+
+
+def process_tree(src_root, dst_root, action, key, mode='cbc', backend=DEFAULT_BACKEND, fast=False,
+                 pattern='*', workers=None, queue_size=None, segment_size=DEFAULT_SEGMENT_SIZE):
+    """
+    Encrypt or decrypt every matching file of a directory tree into a mirror tree
+    
+    Each file becomes a segmented container with its own random salt, so
+    decryption needs only the key. Files are handed to a bounded thread
+    pool as the walk discovers them; at most queue_size files are queued
+    or in flight, so memory stays flat however large the tree is. A file
+    that fails is recorded and the rest carry on.
+    
+    Args:
+        src_root: Input directory
+        dst_root: Output directory (created as needed, not src_root itself)
+        action: 'encrypt' or 'decrypt'
+        key: Encryption key
+        mode: 'cfb' or 'cbc' (encrypt only; containers record their mode)
+        backend: Block-cipher backend name (encrypt only)
+        fast: Use the backend's native CBC/CFB implementation when available
+        pattern: Shell-style pattern file names must match
+        workers: Worker threads (defaults to the CPU count)
+        queue_size: Files queued or in flight (defaults to 4 per worker)
+        segment_size: Plaintext bytes per container segment
+    
+    Returns:
+        Summary dict with files, failed (list of (path, error)), bytes_in,
+        bytes_out and seconds
+    """
+    if action not in ('encrypt', 'decrypt'):
+        raise ValueError("Action must be 'encrypt' or 'decrypt'")
+    if not os.path.isdir(src_root):
+        raise ValueError(f"{src_root} is not a directory")
+    if _same_file(src_root, dst_root):
+        # Every file would be its own destination and be truncated unread
+        raise ValueError("The output directory must differ from the input directory")
+    workers = workers or os.cpu_count() or 1
+    slots = threading.BoundedSemaphore(queue_size or 4 * workers)
+    lock = threading.Lock()
+    summary = {'files': 0, 'failed': [], 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+    
+    def done(future, src_path):
+        slots.release()
+        with lock:
+            try:
+                bytes_in, bytes_out = future.result()
+            except Exception as e:
+                summary['failed'].append((src_path, str(e)))
+                return
+            summary['files'] += 1
+            summary['bytes_in'] += bytes_in
+            summary['bytes_out'] += bytes_out
+    
+    from concurrent.futures import ThreadPoolExecutor
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for src_path, dst_path in _iter_tree(src_root, dst_root, pattern):
+            slots.acquire()
+            future = pool.submit(_process_tree_file, action, src_path, dst_path,
+                                 mode, key, backend, fast, segment_size)
+            future.add_done_callback(lambda f, path=src_path: done(f, path))
+    summary['seconds'] = time.perf_counter() - start
+    return summary
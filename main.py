@@ -1,17 +1,36 @@
 import os
 import sys
 import argparse
+import itertools
 import base64
 from present_cipher import (
     PresentCipher,
+    BACKENDS, DEFAULT_BACKEND,
     generate_salt,
     cfb_encrypt, cfb_decrypt,
-    cbc_encrypt, cbc_decrypt
+    cbc_encrypt, cbc_decrypt,
+    ctr_encrypt, ctr_decrypt, generate_ctr_salt,
+    SaltedEncryptor, SaltedDecryptor
+)
+from cipher_armor import ArmorEncoder, ArmorDecoder, armor
+from cipher_container import (
+    HEADER_SIZE, UNKNOWN_LENGTH,
+    is_container, is_container_file, parse_header, pack_header, check_plaintext_length,
+    write_container, open_container
+)
+from file_cipher import (
+    encrypt_file, decrypt_file, encrypt_container_file, decrypt_container_file,
+    encrypt_file_segmented, decrypt_file_segmented,
+    process_tree,
+    DEFAULT_SEGMENT_SIZE
 )
 
 # Default key (in a real application, this should be securely generated and stored)
 DEFAULT_KEY = os.urandom(16)  # 128-bit key for 3DES-EDE2
 
+# Bytes read per step in streaming mode
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
 
 def get_user_input(prompt, default=None, is_password=False):
     """Helper function to get user input with optional default"""
@@ -31,20 +50,34 @@ def get_user_input(prompt, default=None, is_password=False):
 
 def main():
     parser = argparse.ArgumentParser(description="Salted Cipher Modes - CFB and CBC with Salt")
-    parser.add_argument('--mode', choices=['cfb', 'cbc', 'test'], help='Encryption mode (CFB or CBC) or test performance')
+    parser.add_argument('--mode', choices=['cfb', 'cbc', 'ctr', 'test'], help='Encryption mode (CFB, CBC or CTR) or test performance')
     parser.add_argument('--action', choices=['encrypt', 'decrypt', 'both'], help='Action to perform')
     parser.add_argument('--input', help='Input text or file path')
     parser.add_argument('--output', help='Output file path')
     parser.add_argument('--key', help='Encryption key (base64 encoded)')
     parser.add_argument('--salt', help='Salt/IV (base64 encoded)')
+    parser.add_argument('--backend', choices=list(BACKENDS), help=f'Block cipher backend (default: {DEFAULT_BACKEND})')
+    parser.add_argument('--fast', action='store_true', help="Use the backend's native CBC/CFB implementation (same output)")
+    parser.add_argument('--stream', action='store_true', help='Stream binary data from stdin (or --input file) to stdout (or --output file)')
+    parser.add_argument('--armor', action='store_true', help='With --stream: write (encrypt) or read (decrypt) the ciphertext as line-wrapped base64')
+    parser.add_argument('--chunk-size', type=int, help=f'Bytes per read in streaming mode (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--mmap', action='store_true', help='Process the --input file into the --output file through memory mappings')
+    parser.add_argument('--in-place', action='store_true', help='Encrypt or decrypt the --input file in place (implies --mmap)')
+    parser.add_argument('--segmented', action='store_true', help='Use the segmented container format, processing segments in parallel')
+    parser.add_argument('--recursive', action='store_true', help='Process every file of the --input directory into a mirror tree at --output')
+    parser.add_argument('--pattern', help="File name pattern for --recursive (default: '*')")
+    parser.add_argument('--workers', type=int, help='Worker processes for --segmented, threads for --recursive (default: CPU count)')
+    parser.add_argument('--segment-size', type=int, help=f'Plaintext bytes per segment (default: {DEFAULT_SEGMENT_SIZE})')
+    parser.add_argument('--raw', action='store_true', help='Write and read headerless ciphertext files instead of the self-describing container')
     parser.add_argument('--generate-key', action='store_true', help='Generate a new random key and exit')
     
     args = parser.parse_args()
+    backend = args.backend or DEFAULT_BACKEND
     
     if args.generate_key:
         key = os.urandom(16)  # 128-bit key
         print(f"Generated key (base64): {base64.b64encode(key).decode()}")
-        print(f"Generated salt (base64): {base64.b64encode(generate_salt(8)).decode()}")
+        print(f"Generated salt (base64): {base64.b64encode(generate_salt(backend=backend)).decode()}")
         return
     
     # Interactive mode if no arguments provided
@@ -73,8 +106,32 @@ def main():
         except Exception as e:
             print(f"Error decoding salt: {e}")
             return
+    elif args.mode == 'ctr':
+        # Decryption reads the salt from --salt or the container header
+        if args.action in ['encrypt', 'both']:
+            try:
+                salt = generate_ctr_salt(backend)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
     else:
-        salt = generate_salt(8)
+        salt = generate_salt(backend=backend)
+    
+    if args.stream:
+        stream_mode(args, key, salt, backend)
+        return
+    
+    if args.mmap or args.in_place:
+        mmap_mode(args, key, salt, backend)
+        return
+    
+    if args.segmented:
+        segmented_mode(args, key, salt, backend)
+        return
+    
+    if args.recursive:
+        tree_mode(args, key, backend)
+        return
     
     # Get input data
     input_data = None
@@ -87,9 +144,14 @@ def main():
     else:
         input_data = input("Enter text to process: ").encode('utf-8')
     
+    # Containers carry their own mode, backend and salt
+    if args.action == 'decrypt' and not args.raw and is_container(input_data):
+        container_decrypt(args, key, input_data)
+        return
+    
     # Perform the requested action
     if args.mode == 'test':
-        from present_cipher import measure_performance
+        from performance_analysis import measure_performance
         measure_performance()
         return
     
@@ -100,25 +162,18 @@ def main():
     try:
         if args.mode == 'cfb':
             if args.action in ['encrypt', 'both']:
-                ciphertext, used_salt = cfb_encrypt(input_data, key, salt)
-                output_data = base64.b64encode(ciphertext).decode('utf-8')
+                ciphertext, used_salt = cfb_encrypt(input_data, key, salt, backend=backend, fast=args.fast)
                 print(f"\nCFB Encryption successful!")
-                print(f"Salt (base64): {base64.b64encode(used_salt).decode('utf-8')}")
-                print(f"Ciphertext (base64): {output_data}")
-                
-                if args.output:
-                    with open(args.output, 'wb') as f:
-                        f.write(ciphertext)
-                    print(f"Ciphertext saved to {args.output}")
+                report_ciphertext(args, 'cfb', backend, ciphertext, used_salt, len(input_data))
             
             if args.action in ['decrypt', 'both'] and args.action != 'both':
                 try:
                     if args.action == 'both':
                         # Use the ciphertext from encryption
-                        plaintext = cfb_decrypt(ciphertext, key, used_salt)
+                        plaintext = cfb_decrypt(ciphertext, key, used_salt, backend=backend, fast=args.fast)
                     else:
                         # For decryption only, we need to read the ciphertext
-                        plaintext = cfb_decrypt(input_data, key, salt)
+                        plaintext = cfb_decrypt(input_data, key, salt, backend=backend, fast=args.fast)
                     
                     print(f"\nCFB Decryption successful!")
                     try:
@@ -137,25 +192,18 @@ def main():
         
         elif args.mode == 'cbc':
             if args.action in ['encrypt', 'both']:
-                ciphertext, used_salt = cbc_encrypt(input_data, key, salt)
-                output_data = base64.b64encode(ciphertext).decode('utf-8')
+                ciphertext, used_salt = cbc_encrypt(input_data, key, salt, backend=backend, fast=args.fast)
                 print(f"\nCBC Encryption successful!")
-                print(f"Salt (base64): {base64.b64encode(used_salt).decode('utf-8')}")
-                print(f"Ciphertext (base64): {output_data}")
-                
-                if args.output:
-                    with open(args.output, 'wb') as f:
-                        f.write(ciphertext)
-                    print(f"Ciphertext saved to {args.output}")
+                report_ciphertext(args, 'cbc', backend, ciphertext, used_salt, len(input_data))
             
             if args.action in ['decrypt', 'both'] and args.action != 'both':
                 try:
                     if args.action == 'both':
                         # Use the ciphertext from encryption
-                        plaintext = cbc_decrypt(ciphertext, key, used_salt)
+                        plaintext = cbc_decrypt(ciphertext, key, used_salt, backend=backend, fast=args.fast)
                     else:
                         # For decryption only, we need to read the ciphertext
-                        plaintext = cbc_decrypt(input_data, key, salt)
+                        plaintext = cbc_decrypt(input_data, key, salt, backend=backend, fast=args.fast)
                     
                     print(f"\nCBC Decryption successful!")
                     try:
@@ -171,6 +219,28 @@ def main():
                         print(f"Decrypted data saved to {args.output}")
                 except Exception as e:
                     print(f"Decryption failed: {e}")
+        
+        elif args.mode == 'ctr':
+            if args.action in ['encrypt', 'both']:
+                ciphertext, used_salt = ctr_encrypt(input_data, key, salt, backend=backend)
+                print(f"\nCTR Encryption successful!")
+                report_ciphertext(args, 'ctr', backend, ciphertext, used_salt, len(input_data))
+            
+            if args.action == 'decrypt':
+                if salt is None:
+                    print("Error: --salt is required to decrypt headerless CTR ciphertext")
+                    return
+                plaintext = ctr_decrypt(input_data, key, salt, backend=backend)
+                print(f"\nCTR Decryption successful!")
+                try:
+                    print(f"Decrypted text: {plaintext.decode('utf-8')}")
+                except UnicodeDecodeError:
+                    print(f"Decrypted data (hex): {plaintext.hex()}")
+                
+                if args.output:
+                    with open(args.output, 'wb') as f:
+                        f.write(plaintext)
+                    print(f"Decrypted data saved to {args.output}")
     
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -178,6 +248,231 @@ def main():
             print("Note: The 'both' action may not work with file inputs. Try encrypt and decrypt separately.")
 
 
+def show_plaintext(plaintext):
+    """Print decrypted data as text, or as hex if it is not UTF-8"""
+    try:
+        print(f"Decrypted text: {plaintext.decode('utf-8')}")
+    except UnicodeDecodeError:
+        print(f"Decrypted data (hex): {plaintext.hex()}")
+
+
+def report_ciphertext(args, mode, backend, ciphertext, salt, plaintext_length):
+    """Save the ciphertext to --output (as a container unless --raw) or print it as base64"""
+    print(f"Salt (base64): {base64.b64encode(salt).decode('utf-8')}")
+    if not args.output:
+        print(f"Ciphertext (base64): {base64.b64encode(ciphertext).decode('utf-8')}")
+        return
+    
+    with open(args.output, 'wb') as f:
+        if args.raw:
+            f.write(ciphertext)
+        else:
+            write_container(f, mode, backend, salt, plaintext_length, ciphertext)
+    print(f"Ciphertext saved to {args.output}")
+
+
+def container_decrypt(args, key, data):
+    """Decrypt a container with the mode, backend and salt from its header"""
+    try:
+        header = parse_header(data)
+        plaintext = open_container(data, key, fast=args.fast)
+    except Exception as e:
+        print(f"Decryption failed: {e}")
+        return
+    
+    print(f"\n{header['mode']} Decryption successful! ({header['backend']} container)")
+    show_plaintext(plaintext)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(plaintext)
+        print(f"Decrypted data saved to {args.output}")
+
+
+def stream_mode(args, key, salt, backend):
+    """Encrypt or decrypt a binary stream chunk by chunk with constant memory"""
+    if args.mode not in ['cfb', 'cbc'] or args.action not in ['encrypt', 'decrypt']:
+        print("Error: --stream requires --mode cfb/cbc and --action encrypt/decrypt", file=sys.stderr)
+        return
+    if not args.key:
+        print("Error: --stream requires --key (and --salt to decrypt headerless ciphertext)", file=sys.stderr)
+        return
+    
+    chunk_size = args.chunk_size or DEFAULT_CHUNK_SIZE
+    source = open(args.input, 'rb') if args.input else sys.stdin.buffer
+    sink = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        chunks = iter(lambda: source.read(chunk_size), b'')
+        header = None
+        patch_header = False
+        # Each stage feeds the next; armor wraps the ciphertext side
+        if args.action == 'encrypt':
+            stages = [SaltedEncryptor(args.mode, key, salt, backend=backend, fast=args.fast)]
+            if args.armor:
+                stages.append(ArmorEncoder())
+            if args.raw:
+                # stdout carries the ciphertext, so report the salt on stderr
+                print(f"Salt (base64): {base64.b64encode(salt).decode('utf-8')}", file=sys.stderr)
+            else:
+                # The length is patched in at the end if the output file can
+                # seek back; pipes and armored output keep UNKNOWN_LENGTH
+                patch_header = bool(args.output) and not args.armor and sink.seekable()
+                prefix = pack_header(args.mode, backend, salt, UNKNOWN_LENGTH)
+                for stage in stages[1:]:
+                    prefix = stage.update(prefix)
+                sink.write(prefix)
+        else:
+            if args.armor:
+                chunks = dearmored(chunks)
+            # Read far enough to recognise a container written by --output
+            head = b''
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= HEADER_SIZE:
+                    break
+            if not args.raw and is_container(head):
+                header = parse_header(head)
+                if header['mode'] == 'CTR':
+                    print("Error: CTR containers cannot be streamed; decrypt without --stream", file=sys.stderr)
+                    return
+                stages = [SaltedDecryptor(header['mode'], key, header['salt'],
+                                          backend=header['backend'], fast=args.fast)]
+                head = head[HEADER_SIZE:]
+            elif not args.salt:
+                print("Error: --stream requires --salt to decrypt headerless ciphertext", file=sys.stderr)
+                return
+            else:
+                stages = [SaltedDecryptor(args.mode, key, salt, backend=backend, fast=args.fast)]
+            chunks = itertools.chain([head], chunks)
+        
+        consumed = written = 0
+        for chunk in chunks:
+            consumed += len(chunk)
+            for stage in stages:
+                chunk = stage.update(chunk)
+            sink.write(chunk)
+            written += len(chunk)
+        tail = b''
+        for stage in stages:
+            tail = stage.update(tail) + stage.finalize()
+        sink.write(tail)
+        if patch_header:
+            sink.seek(0)
+            sink.write(pack_header(args.mode, backend, salt, consumed))
+        sink.flush()
+        if header is not None:
+            check_plaintext_length(header, written + len(tail))
+    except ValueError as e:
+        # Corrupted armor, padding or header, or a wrong key
+        print(f"Error: {e}", file=sys.stderr)
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            sink.close()
+
+
+def dearmored(chunks):
+    """Decode line-wrapped base64 chunks into ciphertext chunks"""
+    decoder = ArmorDecoder()
+    for chunk in chunks:
+        yield decoder.update(chunk)
+    yield decoder.finalize()
+
+
+def mmap_mode(args, key, salt, backend):
+    """Encrypt or decrypt a file through memory mappings, optionally in place"""
+    if args.mode not in ['cfb', 'cbc'] or args.action not in ['encrypt', 'decrypt']:
+        print("Error: --mmap requires --mode cfb/cbc and --action encrypt/decrypt")
+        return
+    if not args.input or not os.path.isfile(args.input):
+        print("Error: --mmap requires --input to be an existing file")
+        return
+    if not args.in_place and not args.output:
+        print("Error: --mmap requires --output (or use --in-place)")
+        return
+    
+    output_path = None if args.in_place else args.output
+    try:
+        if args.action == 'encrypt':
+            if args.raw:
+                size = encrypt_file(args.input, output_path, args.mode, key, salt, backend=backend, fast=args.fast)
+            else:
+                size = encrypt_container_file(args.input, output_path, args.mode, key, salt,
+                                              backend=backend, fast=args.fast)
+            print(f"\n{args.mode.upper()} Encryption successful!")
+            print(f"Salt (base64): {base64.b64encode(salt).decode('utf-8')}")
+            print(f"Encrypted size: {size} bytes")
+        elif not args.raw and is_container_file(args.input):
+            # Containers carry their own mode, backend and salt
+            size = decrypt_container_file(args.input, output_path, key, fast=args.fast)
+            print(f"\nContainer decryption successful!")
+            print(f"Decrypted size: {size} bytes")
+        else:
+            size = decrypt_file(args.input, output_path, args.mode, key, salt, backend=backend, fast=args.fast)
+            print(f"\n{args.mode.upper()} Decryption successful!")
+            print(f"Decrypted size: {size} bytes")
+        print(f"Output written to {output_path or args.input}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def segmented_mode(args, key, salt, backend):
+    """Encrypt into or decrypt from a segmented container with worker processes"""
+    if args.action not in ['encrypt', 'decrypt'] or (args.action == 'encrypt' and args.mode not in ['cfb', 'cbc']):
+        print("Error: --segmented requires --action encrypt/decrypt (and --mode cfb/cbc to encrypt)")
+        return
+    if not args.input or not os.path.isfile(args.input) or not args.output:
+        print("Error: --segmented requires an existing --input file and an --output file")
+        return
+    
+    try:
+        if args.action == 'encrypt':
+            header = encrypt_file_segmented(
+                args.input, args.output, args.mode, key, salt, backend=backend, fast=args.fast,
+                segment_size=args.segment_size or DEFAULT_SEGMENT_SIZE, workers=args.workers
+            )
+            print(f"\n{args.mode.upper()} Segmented encryption successful!")
+            print(f"Salt (base64): {base64.b64encode(header['salt']).decode('utf-8')}")
+            print(f"Segments: {len(header['index'])}")
+        else:
+            size = decrypt_file_segmented(args.input, args.output, key, fast=args.fast, workers=args.workers)
+            print(f"\nSegmented decryption successful!")
+            print(f"Decrypted size: {size} bytes")
+        print(f"Output written to {args.output}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def tree_mode(args, key, backend):
+    """Encrypt or decrypt a directory tree into a mirror tree with a thread pool"""
+    if args.action not in ['encrypt', 'decrypt'] or (args.action == 'encrypt' and args.mode not in ['cfb', 'cbc']):
+        print("Error: --recursive requires --action encrypt/decrypt (and --mode cfb/cbc to encrypt)")
+        return
+    if not args.input or not os.path.isdir(args.input) or not args.output:
+        print("Error: --recursive requires an existing --input directory and an --output directory")
+        return
+    
+    try:
+        summary = process_tree(
+            args.input, args.output, args.action, key, mode=args.mode or 'cbc', backend=backend,
+            fast=args.fast, pattern=args.pattern or '*', workers=args.workers,
+            segment_size=args.segment_size or DEFAULT_SEGMENT_SIZE
+        )
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return
+    
+    seconds = summary['seconds']
+    throughput = summary['bytes_in'] / (1024 * 1024) / seconds if seconds > 0 else 0.0
+    print(f"\nTree {args.action}ion finished in {seconds:.2f} s")
+    print(f"Files: {summary['files']} processed, {len(summary['failed'])} failed")
+    print(f"Bytes: {summary['bytes_in']} in, {summary['bytes_out']} out")
+    print(f"Throughput: {throughput:.2f} MB/s, {summary['files'] / seconds if seconds > 0 else 0.0:.1f} files/s")
+    for path, error in summary['failed'][:20]:
+        print(f"  ✗ {path}: {error}")
+    print(f"Output written to {args.output}")
+
+
 def interactive_mode():
     """Run the application in interactive mode"""
     print("\n" + "="*60)
@@ -224,7 +519,7 @@ def interactive_mode():
             print(f"✓ New salt (base64): {base64.b64encode(session_salt).decode()}")
         elif choice == '6':
             print("\nRunning performance tests...")
-            from present_cipher import measure_performance
+            from performance_analysis import measure_performance
             measure_performance()
             print("\n✓ Performance test completed. Check 'encryption_performance.png' for results.")
         elif choice == '7':
@@ -284,7 +579,7 @@ def encrypt_text_menu(key, salt):
             ciphertext, used_salt = cbc_encrypt(input_data, key, salt)
             mode_name = "CBC"
         
-        ciphertext_b64 = base64.b64encode(ciphertext).decode('utf-8')
+        ciphertext_b64 = armor(ciphertext).decode('ascii').rstrip('\n')
         salt_b64 = base64.b64encode(used_salt).decode('utf-8')
         
         print("\n" + "="*60)
@@ -323,43 +618,30 @@ def encrypt_file_menu(key, salt):
             break
         print("✗ Invalid mode. Please enter 'cfb' or 'cbc'.")
     
-    # Get file path
+    # Get file paths
     file_path = input("\nEnter file path to encrypt: ").strip()
-    try:
-        with open(file_path, 'rb') as f:
-            input_data = f.read()
-    except Exception as e:
-        print(f"✗ Error reading file: {e}")
+    if not os.path.isfile(file_path):
+        print(f"✗ Error reading file: {file_path} does not exist")
         return
+    output_path = input("Enter output file path: ").strip()
     
-    # Perform encryption
+    # Perform encryption through memory mappings of both files
     try:
-        if mode == 'cfb':
-            ciphertext, used_salt = cfb_encrypt(input_data, key, salt)
-            mode_name = "CFB"
-        else:  # cbc
-            ciphertext, used_salt = cbc_encrypt(input_data, key, salt)
-            mode_name = "CBC"
+        file_size = os.path.getsize(file_path)
+        encrypted_size = encrypt_container_file(file_path, output_path, mode, key, salt)
+        mode_name = mode.upper()
         
-        salt_b64 = base64.b64encode(used_salt).decode('utf-8')
+        salt_b64 = base64.b64encode(salt).decode('utf-8')
         
         print("\n" + "="*60)
         print(f"✓ {mode_name} ENCRYPTION SUCCESSFUL")
         print("="*60)
         print(f"\nFile: {file_path}")
-        print(f"File size: {len(input_data)} bytes")
-        print(f"Encrypted size: {len(ciphertext)} bytes")
+        print(f"File size: {file_size} bytes")
+        print(f"Encrypted size: {encrypted_size} bytes")
         print(f"\nSalt (base64):\n{salt_b64}")
         print("\n" + "="*60)
-        
-        # Save encrypted file
-        output_path = input("\nEnter output file path: ").strip()
-        try:
-            with open(output_path, 'wb') as f:
-                f.write(ciphertext)
-            print(f"✓ Encrypted file saved to {output_path}")
-        except Exception as e:
-            print(f"✗ Error saving file: {e}")
+        print(f"✓ Encrypted file saved to {output_path}")
     
     except Exception as e:
         print(f"✗ Encryption failed: {e}")
@@ -378,17 +660,25 @@ def decrypt_text_menu(key, salt):
             break
         print("✗ Invalid mode. Please enter 'cfb' or 'cbc'.")
     
-    # Get ciphertext
-    ciphertext_b64 = input("\nEnter ciphertext (base64): ").strip()
-    if not ciphertext_b64:
-        print("✗ No ciphertext provided.")
-        return
-    
+    # Get ciphertext; armored ciphertext spans several lines, so decode
+    # line by line until an empty line
+    print("\nEnter ciphertext (base64, finish with an empty line):")
+    decoder = ArmorDecoder()
+    parts = []
     try:
-        ciphertext = base64.b64decode(ciphertext_b64)
-    except Exception as e:
+        while True:
+            line = input().strip()
+            if not line:
+                break
+            parts.append(decoder.update(line.encode('ascii')))
+        decoder.finalize()
+    except (ValueError, UnicodeEncodeError) as e:
         print(f"✗ Error decoding base64: {e}")
         return
+    ciphertext = b''.join(parts)
+    if not ciphertext:
+        print("✗ No ciphertext provided.")
+        return
     
     # Perform decryption
     try:
@@ -441,40 +731,33 @@ def decrypt_file_menu(key, salt):
             break
         print("✗ Invalid mode. Please enter 'cfb' or 'cbc'.")
     
-    # Get file path
+    # Get file paths
     file_path = input("\nEnter encrypted file path: ").strip()
-    try:
-        with open(file_path, 'rb') as f:
-            ciphertext = f.read()
-    except Exception as e:
-        print(f"✗ Error reading file: {e}")
+    if not os.path.isfile(file_path):
+        print(f"✗ Error reading file: {file_path} does not exist")
         return
+    output_path = input("Enter output file path: ").strip()
     
-    # Perform decryption
+    # Perform decryption through memory mappings of both files
     try:
-        if mode == 'cfb':
-            plaintext = cfb_decrypt(ciphertext, key, salt)
-            mode_name = "CFB"
-        else:  # cbc
-            plaintext = cbc_decrypt(ciphertext, key, salt)
-            mode_name = "CBC"
+        encrypted_size = os.path.getsize(file_path)
+        if is_container_file(file_path):
+            # Containers carry their own mode, backend and salt
+            with open(file_path, 'rb') as f:
+                mode_name = parse_header(f.read(HEADER_SIZE))['mode']
+            decrypted_size = decrypt_container_file(file_path, output_path, key)
+        else:
+            decrypted_size = decrypt_file(file_path, output_path, mode, key, salt)
+            mode_name = mode.upper()
         
         print("\n" + "="*60)
         print(f"✓ {mode_name} DECRYPTION SUCCESSFUL")
         print("="*60)
         print(f"\nFile: {file_path}")
-        print(f"Encrypted size: {len(ciphertext)} bytes")
-        print(f"Decrypted size: {len(plaintext)} bytes")
+        print(f"Encrypted size: {encrypted_size} bytes")
+        print(f"Decrypted size: {decrypted_size} bytes")
         print("\n" + "="*60)
-        
-        # Save decrypted file
-        output_path = input("\nEnter output file path: ").strip()
-        try:
-            with open(output_path, 'wb') as f:
-                f.write(plaintext)
-            print(f"✓ Decrypted file saved to {output_path}")
-        except Exception as e:
-            print(f"✗ Error saving file: {e}")
+        print(f"✓ Decrypted file saved to {output_path}")
     
     except Exception as e:
         print(f"✗ Decryption failed: {e}")
@@ -1,10 +1,189 @@
 import struct
 import time
 import os
-from Crypto.Cipher import DES3
+import sys
+import importlib
+import threading
+from Crypto.Cipher import DES3, AES
 from Crypto.Util.Padding import pad, unpad
-import numpy as np
-import matplotlib.pyplot as plt
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, so
+    callers that never reach the code using it do not pay for the import
+    """
+    
+    def __init__(self, name):
+        self._name = name
+    
+    @property
+    def loaded(self):
+        """True once the module has been imported (by anyone)"""
+        return self._name in sys.modules
+    
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._name), attr)
+        # Cache on the instance so later lookups skip __getattr__
+        setattr(self, attr, value)
+        return value
+
+
+# NumPy is only needed for bulk paths; importing it costs ~100 ms of startup
+np = LazyModule('numpy')
+
+
+# Instrumentation is off unless enabled; each instrumented function checks
+# this one global, so the disabled cost is a single comparison
+_metrics = None
+
+
+class CipherMetrics:
+    """
+    Counters and cumulative phase timings for the cipher functions
+    
+    Values are keyed by metric name and label pairs, as in the Prometheus
+    data model, and updated under a lock so threads can share one instance.
+    """
+    
+    # Metric name -> help text, in exposition order
+    METRICS = {
+        'calls_total': 'Calls of each mode function',
+        'bytes_in_total': 'Bytes passed to each mode function',
+        'bytes_out_total': 'Bytes returned by each mode function',
+        'blocks_total': 'Blocks processed by each mode function or PRESENT engine',
+        'key_setups_total': 'Block cipher contexts created',
+        'padding_failures_total': 'Decryptions with invalid padding (wrong key or corrupted data)',
+        'phase_seconds_total': 'Cumulative seconds per phase of each function',
+    }
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+    
+    def add(self, name, value=1, **labels):
+        """Increase one counter"""
+        self.update([(name, tuple(sorted(labels.items())), value)])
+    
+    def update(self, entries):
+        """Increase several counters at once: (name, label pairs, value) tuples"""
+        with self._lock:
+            for name, labels, value in entries:
+                key = (name, labels)
+                self._values[key] = self._values.get(key, 0) + value
+    
+    def timer(self, function, backend):
+        """Phase timer for one call of a mode function"""
+        return _PhaseTimer(self, function, backend)
+    
+    def reset(self):
+        """Zero every counter"""
+        with self._lock:
+            self._values.clear()
+    
+    def snapshot(self):
+        """
+        Copy of the current values
+        
+        Returns:
+            Dict of metric name -> {label string: value}, e.g.
+            {'calls_total': {'backend=3des,function=cbc_encrypt': 3}}
+        """
+        with self._lock:
+            items = sorted(self._values.items())
+        result = {}
+        for (name, labels), value in items:
+            result.setdefault(name, {})[','.join(f'{k}={v}' for k, v in labels)] = value
+        return result
+    
+    def exposition(self, prefix='saltedcipher'):
+        """Current values in the Prometheus text exposition format"""
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = []
+        for name, help_text in self.METRICS.items():
+            entries = [(labels, value) for (n, labels), value in items if n == name]
+            if not entries:
+                continue
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in entries:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if labels else f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+class _PhaseTimer:
+    """Accumulates the phases of one mode function call into CipherMetrics"""
+    
+    __slots__ = ('metrics', 'function', 'backend', 'entries', 'last')
+    
+    def __init__(self, metrics, function, backend):
+        self.metrics = metrics
+        self.function = function
+        self.backend = backend
+        self.entries = []
+        self.last = time.perf_counter()
+    
+    def lap(self, phase):
+        """Close the current phase"""
+        now = time.perf_counter()
+        labels = (('backend', self.backend), ('function', self.function), ('phase', phase))
+        self.entries.append(('phase_seconds_total', labels, now - self.last))
+        self.last = now
+    
+    def done(self, phase, bytes_in, bytes_out, blocks):
+        """Close the final phase and record the call"""
+        self.lap(phase)
+        labels = (('backend', self.backend), ('function', self.function))
+        self.entries += [('calls_total', labels, 1), ('bytes_in_total', labels, bytes_in),
+                         ('bytes_out_total', labels, bytes_out), ('blocks_total', labels, blocks)]
+        self.metrics.update(self.entries)
+
+
+def _record_engine_blocks(metrics, engine, op, blocks, start):
+    """Count blocks and time spent in a PRESENT engine"""
+    labels = (('engine', type(engine).__name__), ('op', op))
+    metrics.update([('blocks_total', labels, blocks),
+                     ('phase_seconds_total', labels + (('phase', 'block cipher'),), time.perf_counter() - start)])
+
+
+def enable_metrics(metrics=None):
+    """
+    Turn instrumentation on
+    
+    Args:
+        metrics: CipherMetrics to record into (default: keep the current
+                 one or create a new one)
+    
+    Returns:
+        The active CipherMetrics
+    """
+    global _metrics
+    _metrics = metrics or _metrics or CipherMetrics()
+    return _metrics
+
+
+def disable_metrics():
+    """Turn instrumentation off, returning the CipherMetrics that was active"""
+    global _metrics
+    metrics, _metrics = _metrics, None
+    return metrics
+
+
+def metrics_snapshot():
+    """Snapshot of the active metrics, or {} when disabled"""
+    return _metrics.snapshot() if _metrics is not None else {}
+
+
+def metrics_exposition(prefix='saltedcipher'):
+    """Text exposition of the active metrics, or '' when disabled"""
+    return _metrics.exposition(prefix) if _metrics is not None else ''
+
+
+if os.environ.get('SALTEDCIPHER_METRICS'):
+    enable_metrics()
+
 
 class PresentCipher:
     """Lightweight PRESENT cipher implementation"""
@@ -73,17 +252,14 @@ class PresentCipher:
         """Apply bit permutation"""
         result = 0
         for i in range(64):
-            if inverse:
-                # Inverse permutation: bit i comes from position p(i)
-                j = (i * 16) % 63
-                if i == 63:  # Special case for last bit
-                    j = 63
+            if i == 63:  # Special case for last bit
+                j = 63
+            elif inverse:
+                # Inverse permutation: bit i moves back to p^-1(i) = 4i mod 63
+                j = (i * 4) % 63
             else:
-                # Forward permutation: bit i moves to position p(i)
-                if i == 0:
-                    j = 0
-                else:
-                    j = (i * 16) % 63
+                # Forward permutation: bit i moves to position p(i) = 16i mod 63
+                j = (i * 16) % 63
             
             # Set bit j in result to bit i of state
             bit = (state >> i) & 1
@@ -93,6 +269,8 @@ class PresentCipher:
     
     def encrypt_block(self, plaintext):
         """Encrypt a single 64-bit block"""
+        metrics = _metrics
+        start = time.perf_counter() if metrics is not None else 0
         state = int.from_bytes(plaintext, 'big')
         
         for i in range(self.rounds - 1):
@@ -103,10 +281,14 @@ class PresentCipher:
         # Final round (no permutation)
         state = self._add_round_key(state, self.round_keys[-1])
         
+        if metrics is not None:
+            _record_engine_blocks(metrics, self, 'encrypt', 1, start)
         return state.to_bytes(8, 'big')
     
     def decrypt_block(self, ciphertext):
         """Decrypt a single 64-bit block"""
+        metrics = _metrics
+        start = time.perf_counter() if metrics is not None else 0
         state = int.from_bytes(ciphertext, 'big')
         
         # Final round (in reverse order)
@@ -117,39 +299,541 @@ class PresentCipher:
             state = self._sbox_layer(state, inverse=True)
             state = self._add_round_key(state, self.round_keys[i])
         
+        if metrics is not None:
+            _record_engine_blocks(metrics, self, 'decrypt', 1, start)
+        return state.to_bytes(8, 'big')
+
+
+class TablePresentCipher(PresentCipher):
+    """Table-driven PRESENT engine, byte-identical to PresentCipher
+    
+    The S-box and bit permutation of each round are merged into eight
+    byte-indexed SP tables, so a round is one key XOR plus eight table
+    lookups. The tables are derived from PresentCipher's own layers and
+    built once per process.
+    """
+    
+    _tables = None
+    
+    def __init__(self, key, rounds=32):
+        super().__init__(key, rounds)
+        self.sp, self.p_inv, self.sp_inv, self.sbox_inv_bytes = self._get_tables()
+        # The inverse permutation is linear, so it can be folded into the
+        # round keys used between the inverse S-box layers
+        self.p_inv_round_keys = [self._lookup(self.p_inv, k) for k in self.round_keys]
+    
+    @classmethod
+    def _get_tables(cls):
+        """Build the SP lookup tables on first use"""
+        if TablePresentCipher._tables is None:
+            TablePresentCipher._tables = cls._build_tables()
+        return TablePresentCipher._tables
+    
+    @staticmethod
+    def _build_tables():
+        """Derive byte-indexed tables from the reference layers"""
+        # The layers are key-independent, so an unkeyed instance is enough
+        ref = PresentCipher.__new__(PresentCipher)
+        sbox_bytes = [ref._sbox_layer(b) & 0xFF for b in range(256)]
+        sbox_inv_bytes = [ref._sbox_layer(b, inverse=True) & 0xFF for b in range(256)]
+        
+        # Each output bit of the permutation is the OR of the input bits
+        # mapped onto it, so per-byte contributions combine with OR
+        sp = tuple(
+            tuple(ref._p_layer(sbox_bytes[b] << (8 * k)) for b in range(256))
+            for k in range(8)
+        )
+        p_inv = tuple(
+            tuple(ref._p_layer(b << (8 * k), inverse=True) for b in range(256))
+            for k in range(8)
+        )
+        sp_inv = tuple(
+            tuple(ref._p_layer(sbox_inv_bytes[b] << (8 * k), inverse=True) for b in range(256))
+            for k in range(8)
+        )
+        return sp, p_inv, sp_inv, bytes(sbox_inv_bytes)
+    
+    @staticmethod
+    def _lookup(tables, state):
+        """Apply a byte-indexed table set to a 64-bit state"""
+        t0, t1, t2, t3, t4, t5, t6, t7 = tables
+        b = state.to_bytes(8, 'little')
+        return (t0[b[0]] | t1[b[1]] | t2[b[2]] | t3[b[3]] |
+                t4[b[4]] | t5[b[5]] | t6[b[6]] | t7[b[7]])
+    
+    def _encrypt_state(self, state):
+        """Encrypt a 64-bit block given as an integer"""
+        t0, t1, t2, t3, t4, t5, t6, t7 = self.sp
+        round_keys = self.round_keys
+        
+        for i in range(self.rounds - 1):
+            b = (state ^ round_keys[i]).to_bytes(8, 'little')
+            state = (t0[b[0]] | t1[b[1]] | t2[b[2]] | t3[b[3]] |
+                     t4[b[4]] | t5[b[5]] | t6[b[6]] | t7[b[7]])
+        
+        # Final round (no permutation)
+        return state ^ round_keys[-1]
+    
+    def _decrypt_state(self, state):
+        """Decrypt a 64-bit block given as an integer"""
+        t0, t1, t2, t3, t4, t5, t6, t7 = self.sp_inv
+        round_keys = self.round_keys
+        p_inv_round_keys = self.p_inv_round_keys
+        state ^= round_keys[-1]
+        
+        if self.rounds < 2:
+            return state
+        
+        state = self._lookup(self.p_inv, state)
+        
+        # Inverse S-box of round i merged with the inverse permutation of round i-1
+        for i in range(self.rounds - 2, 0, -1):
+            b = state.to_bytes(8, 'little')
+            state = (t0[b[0]] | t1[b[1]] | t2[b[2]] | t3[b[3]] |
+                     t4[b[4]] | t5[b[5]] | t6[b[6]] | t7[b[7]]) ^ p_inv_round_keys[i]
+        
+        # Last inverse S-box layer works byte-wise, no permutation follows
+        state = int.from_bytes(state.to_bytes(8, 'big').translate(self.sbox_inv_bytes), 'big')
+        return state ^ round_keys[0]
+    
+    def encrypt_block(self, plaintext):
+        """Encrypt a single 64-bit block"""
+        metrics = _metrics
+        start = time.perf_counter() if metrics is not None else 0
+        state = self._encrypt_state(int.from_bytes(plaintext, 'big'))
+        if metrics is not None:
+            _record_engine_blocks(metrics, self, 'encrypt', 1, start)
         return state.to_bytes(8, 'big')
+    
+    def decrypt_block(self, ciphertext):
+        """Decrypt a single 64-bit block"""
+        metrics = _metrics
+        start = time.perf_counter() if metrics is not None else 0
+        state = self._decrypt_state(int.from_bytes(ciphertext, 'big'))
+        if metrics is not None:
+            _record_engine_blocks(metrics, self, 'decrypt', 1, start)
+        return state.to_bytes(8, 'big')
+
+
+class BatchPresentCipher(TablePresentCipher):
+    """NumPy-bitsliced PRESENT engine for many independent 64-bit blocks
+    
+    Blocks are taken 64 at a time and transposed into 64 bit planes, word j
+    holding bit j of every block. The S-box layer then becomes a short
+    circuit of bitwise operations over whole arrays and the bit permutation
+    a mere reordering of planes. Output is identical to PresentCipher block
+    by block.
+    """
+    
+    # Blocks per vectorized pass; keeps the bit planes cache-resident
+    CHUNK_BLOCKS = 65536
+    
+    # Fewer blocks than this go through the table engine one by one: the
+    # bitsliced pass has a fixed cost of several hundred NumPy calls
+    BITSLICE_MIN_BLOCKS = 32
+    
+    _transpose_stages = None
+    
+    def __init__(self, key, rounds=32):
+        super().__init__(key, rounds)
+        self.transpose_stages = self._get_transpose_stages()
+        # Round keys spread over the planes: all-zero or all-one words
+        bits = (np.array(self.round_keys, dtype=np.uint64)[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+        self.key_planes = (bits * np.uint64(0xFFFFFFFFFFFFFFFF))[:, :, None]
+    
+    @classmethod
+    def _get_transpose_stages(cls):
+        """Shift and mask of each swap stage of a 64x64 bit-matrix transpose, on first use"""
+        if BatchPresentCipher._transpose_stages is None:
+            BatchPresentCipher._transpose_stages = [
+                (j, np.uint64(j), np.uint64(sum(((1 << j) - 1) << (2 * j * k) for k in range(32 // j))))
+                for j in (32, 16, 8, 4, 2, 1)
+            ]
+        return BatchPresentCipher._transpose_stages
+    
+    def _transpose(self, words):
+        """Transpose in place the 64x64 bit matrices stored one per column of a (64, n) array"""
+        columns = words.shape[1]
+        scratch = np.empty((32, columns), dtype=np.uint64)
+        for j, shift, mask in self.transpose_stages:
+            # Swap the high half of row r with the low half of row r + j
+            pairs = words.reshape(32 // j, 2, j, columns)
+            low, high = pairs[:, 0], pairs[:, 1]
+            t = scratch.reshape(32 // j, j, columns)
+            np.right_shift(low, shift, out=t)
+            t ^= high
+            t &= mask
+            high ^= t
+            t <<= shift
+            low ^= t
+        return words
+    
+    def _to_planes(self, state):
+        """Bit planes of a chunk: column g of row j holds bit j of blocks 64g..64g+63"""
+        blocks = np.zeros(-(-len(state) // 64) * 64, dtype=np.uint64)
+        blocks[:len(state)] = state
+        return self._transpose(np.ascontiguousarray(blocks.reshape(-1, 64).T))
+    
+    def _from_planes(self, planes, count):
+        """Block states of the first count blocks held in bit planes"""
+        return self._transpose(planes).T.ravel()[:count]
+    
+    @staticmethod
+    def _sbox_planes(x0, x1, x2, x3, y0, y1, y2, y3, t1, t2, t3):
+        """S-box over bit planes, x0 and y0 the least significant bits (15 operations)"""
+        np.bitwise_xor(x1, x2, out=t1)
+        np.bitwise_and(x2, t1, out=t2)
+        np.bitwise_xor(x3, t2, out=t3)
+        np.bitwise_xor(x0, t3, out=y0)
+        np.bitwise_and(t1, t3, out=t2)
+        t1 ^= y0
+        t2 ^= x2
+        np.bitwise_or(x0, t2, out=y1)
+        y1 ^= t1
+        t2 ^= x0
+        np.invert(t2, out=t2)
+        np.bitwise_xor(y1, t2, out=y3)
+        t2 |= t1
+        np.bitwise_xor(t3, t2, out=y2)
+    
+    @staticmethod
+    def _sbox_inv_planes(x0, x1, x2, x3, y0, y1, y2, y3, t1, t2, t3, t4):
+        """Inverse S-box over bit planes, x0 and y0 the least significant bits"""
+        np.bitwise_xor(x1, x3, out=t1)
+        np.bitwise_and(x1, x3, out=t2)
+        np.bitwise_and(x2, t1, out=t3)
+        np.bitwise_xor(x2, t2, out=t4)
+        np.bitwise_xor(x0, t4, out=y0)
+        np.invert(y0, out=y0)
+        np.bitwise_xor(x1, t3, out=y3)
+        y3 &= x0
+        y3 ^= x0
+        np.bitwise_xor(t1, t2, out=y1)
+        t1 ^= x2
+        y3 ^= t1
+        t4 ^= t3
+        t4 &= x0
+        t4 ^= x0
+        np.bitwise_and(x2, x3, out=t2)
+        y1 ^= t2
+        y1 ^= t4
+        np.bitwise_xor(x2, x3, out=t3)
+        t3 &= x1
+        np.bitwise_xor(x3, t3, out=y2)
+        t1 ^= t3
+        t1 ^= t2
+        t1 &= x0
+        y2 ^= t1
+        np.invert(y2, out=y2)
+    
+    @staticmethod
+    def _to_state(data):
+        """Convert a uint64 array or N*8 bytes into little-endian block states"""
+        if isinstance(data, np.ndarray):
+            if data.dtype != np.uint64:
+                raise ValueError("Block array must have dtype uint64")
+            return data.astype('<u8').ravel()
+        if memoryview(data).nbytes % 8:
+            raise ValueError("Data length must be a multiple of 8 bytes")
+        return np.frombuffer(data, dtype='>u8').astype('<u8')
+    
+    def _process(self, data, chunk_func, block_func):
+        """
+        Run chunk_func over the blocks in data (block_func on each block of
+        short inputs), returning the same kind of object
+        """
+        state = self._to_state(data)
+        if len(state) < self.BITSLICE_MIN_BLOCKS:
+            out = np.array([block_func(int(block)) for block in state], dtype='<u8')
+        else:
+            out = np.empty_like(state)
+            for start in range(0, len(state), self.CHUNK_BLOCKS):
+                end = start + self.CHUNK_BLOCKS
+                out[start:end] = chunk_func(state[start:end])
+        
+        if isinstance(data, np.ndarray):
+            return out.astype(np.uint64)
+        return out.astype('>u8').tobytes()
+    
+    def _encrypt_chunk(self, state):
+        planes = self._to_planes(state)
+        columns = planes.shape[1]
+        spare = np.empty_like(planes)
+        temps = np.empty((3, 16, columns), dtype=np.uint64)
+        for i in range(self.rounds - 1):
+            planes ^= self.key_planes[i]
+            # Bit b of nibble s is plane 4s+b; the permutation moves it to
+            # plane 16b+s, so output bit b of all nibbles fills rows 16b..16b+15
+            x = planes.reshape(16, 4, columns)
+            y = spare.reshape(4, 16, columns)
+            self._sbox_planes(x[:, 0], x[:, 1], x[:, 2], x[:, 3], y[0], y[1], y[2], y[3], *temps)
+            planes, spare = spare, planes
+        planes ^= self.key_planes[-1]
+        return self._from_planes(planes, len(state))
+    
+    def _decrypt_chunk(self, state):
+        planes = self._to_planes(state)
+        columns = planes.shape[1]
+        spare = np.empty_like(planes)
+        temps = np.empty((4, 16, columns), dtype=np.uint64)
+        planes ^= self.key_planes[-1]
+        for i in range(self.rounds - 2, -1, -1):
+            # Inverse permutation: plane 16b+s returns to bit b of nibble s
+            x = planes.reshape(4, 16, columns)
+            y = spare.reshape(16, 4, columns)
+            self._sbox_inv_planes(x[0], x[1], x[2], x[3], y[:, 0], y[:, 1], y[:, 2], y[:, 3], *temps)
+            planes, spare = spare, planes
+            planes ^= self.key_planes[i]
+        return self._from_planes(planes, len(state))
+    
+    def encrypt_blocks(self, data):
+        """
+        Encrypt many 64-bit blocks in one call
+        
+        Args:
+            data: uint64 array of block values, or bytes-like of N*8 bytes
+        
+        Returns:
+            uint64 array for array input, bytes otherwise
+        """
+        metrics = _metrics
+        start = time.perf_counter() if metrics is not None else 0
+        result = self._process(data, self._encrypt_chunk, self._encrypt_state)
+        if metrics is not None:
+            _record_engine_blocks(metrics, self, 'encrypt', len(result) // 8 if isinstance(result, bytes) else len(result), start)
+        return result
+    
+    def decrypt_blocks(self, data):
+        """
+        Decrypt many 64-bit blocks in one call
+        
+        Args:
+            data: uint64 array of block values, or bytes-like of N*8 bytes
+        
+        Returns:
+            uint64 array for array input, bytes otherwise
+        """
+        metrics = _metrics
+        start = time.perf_counter() if metrics is not None else 0
+        result = self._process(data, self._decrypt_chunk, self._decrypt_state)
+        if metrics is not None:
+            _record_engine_blocks(metrics, self, 'decrypt', len(result) // 8 if isinstance(result, bytes) else len(result), start)
+        return result
 
 
-def generate_salt(length=8):
-    """Generate a random salt"""
+class PresentECB:
+    """ECB wrapper giving a PRESENT engine the pycryptodome cipher interface"""
+    
+    block_size = 8
+    
+    def __init__(self, engine):
+        self.engine = engine
+    
+    def _check_length(self, data):
+        if len(data) % self.block_size:
+            raise ValueError("Data must be aligned to block boundary in ECB mode")
+    
+    def encrypt(self, data):
+        """Encrypt one or more whole blocks"""
+        self._check_length(data)
+        if hasattr(self.engine, 'encrypt_blocks'):
+            return self.engine.encrypt_blocks(data)
+        return b''.join(self.engine.encrypt_block(data[i:i+8]) for i in range(0, len(data), 8))
+    
+    def decrypt(self, data):
+        """Decrypt one or more whole blocks"""
+        self._check_length(data)
+        if hasattr(self.engine, 'decrypt_blocks'):
+            return self.engine.decrypt_blocks(data)
+        return b''.join(self.engine.decrypt_block(data[i:i+8]) for i in range(0, len(data), 8))
+
+
+# Block-cipher backends for the salted modes:
+# name -> (ECB factory, block size, pycryptodome module or None, thread safe)
+BACKENDS = {}
+DEFAULT_BACKEND = '3des'
+
+
+def register_backend(name, factory, block_size, native_module=None, thread_safe=False):
+    """
+    Register a block-cipher backend for the salted modes
+    
+    Args:
+        name: Backend name used to select it
+        factory: Callable taking a key and returning an object with
+                 ECB-style encrypt(data) and decrypt(data) methods
+        block_size: Block size in bytes (also the salt length)
+        native_module: pycryptodome cipher module whose native CBC/CFB
+                       implementations can serve the fast mode
+        thread_safe: True if one cipher object may be shared across threads
+    """
+    BACKENDS[name] = (factory, block_size, native_module, thread_safe)
+
+
+def get_block_size(backend=DEFAULT_BACKEND):
+    """Return the block size (and salt length) of a backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[backend][1]
+
+
+def is_thread_safe(backend=DEFAULT_BACKEND):
+    """Return True if the backend's cipher objects may be shared across threads"""
+    get_block_size(backend)
+    return BACKENDS[backend][3]
+
+
+def new_block_cipher(key, backend=DEFAULT_BACKEND):
+    """
+    Create an ECB block cipher for the given backend
+    
+    key may be raw key bytes or a keyring handle (any object with a
+    block_cipher(backend) method), which returns a cached context.
+    """
+    get_block_size(backend)
+    if hasattr(key, 'block_cipher'):
+        return key.block_cipher(backend)
+    if _metrics is not None:
+        _metrics.add('key_setups_total', backend=backend)
+    return BACKENDS[backend][0](key)
+
+
+def has_native_modes(backend=DEFAULT_BACKEND):
+    """Return True if the backend can run the salted modes natively"""
+    get_block_size(backend)
+    return BACKENDS[backend][2] is not None
+
+
+def _new_native_cipher(key, backend, mode_name, salt):
+    """Create a pycryptodome CBC or full-block CFB cipher matching the salted modes"""
+    module = BACKENDS[backend][2]
+    if _metrics is not None:
+        _metrics.add('key_setups_total', backend=f'{backend}-native')
+    # Native chaining ciphers carry the IV, so they are built from the raw key
+    key = getattr(key, 'key', key)
+    if mode_name == 'CBC':
+        return module.new(key, module.MODE_CBC, iv=salt)
+    # Full-block feedback is what the Python CFB loop implements
+    return module.new(key, module.MODE_CFB, iv=salt, segment_size=8 * module.block_size)
+
+
+register_backend('3des', lambda key: DES3.new(key, DES3.MODE_ECB), DES3.block_size, DES3)
+register_backend('aes', lambda key: AES.new(key, AES.MODE_ECB), AES.block_size, AES)
+register_backend('present', lambda key: PresentECB(PresentCipher(key)), 8, thread_safe=True)
+register_backend('present-table', lambda key: PresentECB(TablePresentCipher(key)), 8, thread_safe=True)
+register_backend('present-batch', lambda key: PresentECB(BatchPresentCipher(key)), 8, thread_safe=True)
+
+
+def _resolve_block_size(backend, block_size, salt, mode_name):
+    """Check block size and salt against the backend and return the block size"""
+    backend_block_size = get_block_size(backend)
+    if block_size is None:
+        block_size = backend_block_size
+    elif block_size != backend_block_size:
+        raise ValueError(f"Block size must be {backend_block_size} bytes for backend '{backend}'")
+    if len(salt) != block_size:
+        raise ValueError(f"Salt must be {block_size} bytes for {mode_name} mode")
+    return block_size
+
+
+def _unpad_or_raw(padded_plaintext, block_size, function=None):
+    """Remove padding, returning the raw plaintext if it is invalid"""
+    try:
+        return unpad(padded_plaintext, block_size)
+    except ValueError:
+        if _metrics is not None:
+            _metrics.add('padding_failures_total', function=function or 'unknown')
+        # If unpadding fails, return the raw plaintext (might be incorrect key)
+        return padded_plaintext
+
+
+def generate_salt(length=None, backend=DEFAULT_BACKEND):
+    """Generate a random salt (one block of the backend by default)"""
+    if length is None:
+        length = get_block_size(backend)
     return os.urandom(length)
 
 
+# Buffers shorter than this XOR faster as big integers than through NumPy
+XOR_NUMPY_THRESHOLD = 256
+
+# Until NumPy is loaded, buffers up to this size XOR as big integers too:
+# a one-shot call would spend longer importing NumPy than XORing
+XOR_IMPORT_THRESHOLD = 1024 * 1024
+
+
 def xor_bytes(a, b):
-    """XOR two byte strings of the same length"""
-    return bytes(x ^ y for x, y in zip(a, b))
+    """
+    XOR two byte buffers as a whole
+    
+    Args:
+        a, b: bytes-like objects; mismatched lengths XOR up to the shorter one
+    
+    Returns:
+        bytes as long as the shorter input
+    """
+    n = min(len(a), len(b))
+    if n < XOR_NUMPY_THRESHOLD or (n < XOR_IMPORT_THRESHOLD and not np.loaded):
+        return (int.from_bytes(a[:n], 'little') ^ int.from_bytes(b[:n], 'little')).to_bytes(n, 'little')
+    return np.bitwise_xor(np.frombuffer(a, np.uint8, n), np.frombuffer(b, np.uint8, n)).tobytes()
+
+
+def xor_into(dst, src):
+    """
+    XOR src into dst in place
+    
+    Args:
+        dst: Writable buffer (bytearray, memoryview, mmap)
+        src: bytes-like object; only the overlapping length is XORed
+    
+    Returns:
+        Number of bytes XORed
+    """
+    n = min(len(dst), len(src))
+    if n < XOR_NUMPY_THRESHOLD or (n < XOR_IMPORT_THRESHOLD and not np.loaded):
+        dst[:n] = xor_bytes(dst, src)
+        return n
+    out = np.frombuffer(dst, np.uint8, n)
+    np.bitwise_xor(out, np.frombuffer(src, np.uint8, n), out=out)
+    return n
 
 
-def cfb_encrypt(plaintext, key, salt, block_size=8):
+def cfb_encrypt(plaintext, key, salt, block_size=None, backend=DEFAULT_BACKEND, fast=False):
     """
     CFB mode encryption with salt as IV
     
     Args:
         plaintext: Bytes to encrypt
-        key: Encryption key (16 or 24 bytes for 3DES)
-        salt: Random salt to use as IV (8 bytes for DES3)
-        block_size: Block size in bytes (8 for DES3)
+        key: Encryption key (16 or 24 bytes for 3DES) or keyring handle
+        salt: Random salt to use as IV (one block, 8 bytes for DES3)
+        block_size: Block size in bytes (defaults to the backend's)
+        backend: Block-cipher backend name (see BACKENDS)
+        fast: Use the backend's native CBC/CFB implementation when it has
+              one; the output is identical to the Python loop
     
     Returns:
         Tuple of (ciphertext, salt)
     """
-    if len(salt) != block_size:
-        raise ValueError(f"Salt must be {block_size} bytes for CFB mode")
+    timer = _metrics.timer('cfb_encrypt', backend) if _metrics is not None else None
+    block_size = _resolve_block_size(backend, block_size, salt, 'CFB')
     
-    cipher = DES3.new(key, DES3.MODE_ECB)
+    if fast and has_native_modes(backend):
+        cipher = _new_native_cipher(key, backend, 'CFB', salt)
+        if timer is not None:
+            timer.lap('key setup')
+        ciphertext = cipher.encrypt(pad(plaintext, block_size))
+        if timer is not None:
+            timer.done('block loop', len(plaintext), len(ciphertext), len(ciphertext) // block_size)
+        return ciphertext, salt
+    
+    cipher = new_block_cipher(key, backend)
+    if timer is not None:
+        timer.lap('key setup')
     
     # Pad the plaintext if needed
     padded = pad(plaintext, block_size)
+    if timer is not None:
+        timer.lap('padding')
     
     # Encrypt the salt to get the first block of keystream
     keystream = cipher.encrypt(salt)
@@ -168,71 +852,95 @@ def cfb_encrypt(plaintext, key, salt, block_size=8):
         ciphertext_block = xor_bytes(blocks[i], keystream)
         ciphertext_blocks.append(ciphertext_block)
     
-    return b''.join(ciphertext_blocks), salt
+    if timer is None:
+        return b''.join(ciphertext_blocks), salt
+    timer.lap('block loop')
+    ciphertext = b''.join(ciphertext_blocks)
+    timer.done('output assembly', len(plaintext), len(ciphertext), len(blocks))
+    return ciphertext, salt
 
 
-def cfb_decrypt(ciphertext, key, salt, block_size=8):
+def cfb_decrypt(ciphertext, key, salt, block_size=None, backend=DEFAULT_BACKEND, fast=False):
     """
     CFB mode decryption with salt as IV
     
     Args:
         ciphertext: Bytes to decrypt
-        key: Decryption key (16 or 24 bytes for 3DES)
-        salt: Salt used as IV (8 bytes for DES3)
-        block_size: Block size in bytes (8 for DES3)
+        key: Decryption key (16 or 24 bytes for 3DES) or keyring handle
+        salt: Salt used as IV (one block, 8 bytes for DES3)
+        block_size: Block size in bytes (defaults to the backend's)
+        backend: Block-cipher backend name (see BACKENDS)
+        fast: Use the backend's native CBC/CFB implementation when it has
+              one; the output is identical to the Python loop
     
     Returns:
         Decrypted plaintext
     """
-    if len(salt) != block_size:
-        raise ValueError(f"Salt must be {block_size} bytes for CFB mode")
-    
-    cipher = DES3.new(key, DES3.MODE_ECB)
-    
-    # Split into blocks
-    blocks = [ciphertext[i:i+block_size] for i in range(0, len(ciphertext), block_size)]
-    plaintext_blocks = []
-    
-    # First block uses salt as IV
-    keystream = cipher.encrypt(salt)
-    plaintext_block = xor_bytes(blocks[0], keystream)
-    plaintext_blocks.append(plaintext_block)
+    timer = _metrics.timer('cfb_decrypt', backend) if _metrics is not None else None
+    block_size = _resolve_block_size(backend, block_size, salt, 'CFB')
+    num_blocks = -(-len(ciphertext) // block_size)
     
-    # Subsequent blocks use previous ciphertext block as input
-    for i in range(1, len(blocks)):
-        keystream = cipher.encrypt(blocks[i-1])
-        plaintext_block = xor_bytes(blocks[i], keystream)
-        plaintext_blocks.append(plaintext_block)
+    if fast and has_native_modes(backend):
+        cipher = _new_native_cipher(key, backend, 'CFB', salt)
+        if timer is not None:
+            timer.lap('key setup')
+        padded = cipher.decrypt(ciphertext)
+    else:
+        cipher = new_block_cipher(key, backend)
+        if timer is not None:
+            timer.lap('key setup')
+        
+        # Keystream inputs are the salt followed by every ciphertext block but
+        # the last, so the whole keystream comes from one bulk ECB call
+        feedback = salt + ciphertext[:max(num_blocks - 1, 0) * block_size]
+        keystream = cipher.encrypt(feedback)
+        padded = xor_bytes(ciphertext, keystream)
+    if timer is not None:
+        timer.lap('block loop')
     
     # Remove padding
-    padded_plaintext = b''.join(plaintext_blocks)
-    try:
-        return unpad(padded_plaintext, block_size)
-    except ValueError:
-        # If unpadding fails, return the raw plaintext (might be incorrect key)
-        return padded_plaintext
+    plaintext = _unpad_or_raw(padded, block_size, 'cfb_decrypt')
+    if timer is not None:
+        timer.done('unpadding', len(ciphertext), len(plaintext), num_blocks)
+    return plaintext
 
 
-def cbc_encrypt(plaintext, key, salt, block_size=8):
+def cbc_encrypt(plaintext, key, salt, block_size=None, backend=DEFAULT_BACKEND, fast=False):
     """
     CBC mode encryption with salt as IV
     
     Args:
         plaintext: Bytes to encrypt
-        key: Encryption key (16 or 24 bytes for 3DES)
-        salt: Random salt to use as IV (8 bytes for DES3)
-        block_size: Block size in bytes (8 for DES3)
+        key: Encryption key (16 or 24 bytes for 3DES) or keyring handle
+        salt: Random salt to use as IV (one block, 8 bytes for DES3)
+        block_size: Block size in bytes (defaults to the backend's)
+        backend: Block-cipher backend name (see BACKENDS)
+        fast: Use the backend's native CBC/CFB implementation when it has
+              one; the output is identical to the Python loop
     
     Returns:
         Tuple of (ciphertext, salt)
     """
-    if len(salt) != block_size:
-        raise ValueError(f"Salt must be {block_size} bytes for CBC mode")
+    timer = _metrics.timer('cbc_encrypt', backend) if _metrics is not None else None
+    block_size = _resolve_block_size(backend, block_size, salt, 'CBC')
     
-    cipher = DES3.new(key, DES3.MODE_ECB)
+    if fast and has_native_modes(backend):
+        cipher = _new_native_cipher(key, backend, 'CBC', salt)
+        if timer is not None:
+            timer.lap('key setup')
+        ciphertext = cipher.encrypt(pad(plaintext, block_size))
+        if timer is not None:
+            timer.done('block loop', len(plaintext), len(ciphertext), len(ciphertext) // block_size)
+        return ciphertext, salt
+    
+    cipher = new_block_cipher(key, backend)
+    if timer is not None:
+        timer.lap('key setup')
     
     # Pad the plaintext
     padded = pad(plaintext, block_size)
+    if timer is not None:
+        timer.lap('padding')
     
     # Split into blocks
     blocks = [padded[i:i+block_size] for i in range(0, len(padded), block_size)]
@@ -247,152 +955,669 @@ def cbc_encrypt(plaintext, key, salt, block_size=8):
         ciphertext_blocks.append(encrypted)
         previous = encrypted
     
-    return b''.join(ciphertext_blocks), salt
+    if timer is None:
+        return b''.join(ciphertext_blocks), salt
+    timer.lap('block loop')
+    ciphertext = b''.join(ciphertext_blocks)
+    timer.done('output assembly', len(plaintext), len(ciphertext), len(blocks))
+    return ciphertext, salt
 
 
-def cbc_decrypt(ciphertext, key, salt, block_size=8):
+def cbc_decrypt(ciphertext, key, salt, block_size=None, backend=DEFAULT_BACKEND, fast=False):
     """
     CBC mode decryption with salt as IV
     
     Args:
         ciphertext: Bytes to decrypt
-        key: Decryption key (16 or 24 bytes for 3DES)
-        salt: Salt used as IV (8 bytes for DES3)
-        block_size: Block size in bytes (8 for DES3)
+        key: Decryption key (16 or 24 bytes for 3DES) or keyring handle
+        salt: Salt used as IV (one block, 8 bytes for DES3)
+        block_size: Block size in bytes (defaults to the backend's)
+        backend: Block-cipher backend name (see BACKENDS)
+        fast: Use the backend's native CBC/CFB implementation when it has
+              one; the output is identical to the Python loop
     
     Returns:
         Decrypted plaintext
     """
-    if len(salt) != block_size:
-        raise ValueError(f"Salt must be {block_size} bytes for CBC mode")
+    timer = _metrics.timer('cbc_decrypt', backend) if _metrics is not None else None
+    block_size = _resolve_block_size(backend, block_size, salt, 'CBC')
     
-    cipher = DES3.new(key, DES3.MODE_ECB)
+    if fast and has_native_modes(backend):
+        cipher = _new_native_cipher(key, backend, 'CBC', salt)
+        if timer is not None:
+            timer.lap('key setup')
+        padded = cipher.decrypt(ciphertext)
+    else:
+        cipher = new_block_cipher(key, backend)
+        if timer is not None:
+            timer.lap('key setup')
+        
+        # Every block decrypts independently, so run the cipher over the whole
+        # ciphertext at once and XOR with the ciphertext shifted by one block
+        # (salt first), which is the previous block for each position
+        decrypted = cipher.decrypt(ciphertext)
+        previous = salt + ciphertext[:len(ciphertext) - block_size]
+        padded = xor_bytes(decrypted, previous)
+    if timer is not None:
+        timer.lap('block loop')
     
-    # Split into blocks
-    blocks = [ciphertext[i:i+block_size] for i in range(0, len(ciphertext), block_size)]
-    plaintext_blocks = []
-    previous = salt  # Use salt as IV for first block
+    # Remove padding
+    plaintext = _unpad_or_raw(padded, block_size, 'cbc_decrypt')
+    if timer is not None:
+        timer.done('unpadding', len(ciphertext), len(plaintext), len(ciphertext) // block_size)
+    return plaintext
+
+
+# Bytes of keystream generated per bulk ECB call in CTR mode
+CTR_CHUNK_SIZE = 1024 * 1024
+
+
+def ctr_nonce_size(backend=DEFAULT_BACKEND):
+    """Salt length for CTR mode: half a block, the other half is the counter"""
+    return get_block_size(backend) // 2
+
+
+# Random CTR nonces shorter than this collide too soon to draw one per
+# message: the 4-byte nonces of the 64-bit block backends repeat after about
+# 2^16 messages under one key, and a repeated nonce reuses the keystream
+MIN_RANDOM_NONCE_SIZE = 8
+
+
+def generate_ctr_salt(backend=DEFAULT_BACKEND):
+    """
+    Generate a random CTR nonce for the backend
     
-    for block in blocks:
-        # Decrypt the block
-        decrypted = cipher.decrypt(block)
-        # XOR with previous ciphertext (or IV for first block)
-        xored = xor_bytes(decrypted, previous)
-        plaintext_blocks.append(xored)
-        previous = block
+    Backends whose nonce is shorter than MIN_RANDOM_NONCE_SIZE are refused;
+    their callers must supply unique salts (e.g. a message counter) instead.
+    """
+    size = ctr_nonce_size(backend)
+    if size < MIN_RANDOM_NONCE_SIZE:
+        raise ValueError(f"Random CTR salts are unsafe with the {8 * get_block_size(backend)}-bit block "
+                         f"'{backend}' backend ({size}-byte nonces repeat after about 2^{4 * size} messages); "
+                         "pass a unique salt or use a 128-bit block backend")
+    return os.urandom(size)
+
+
+def _ctr_counter_blocks(salt, block_size, first, last):
+    """Counter blocks salt || counter for block numbers first..last-1"""
+    counter_size = block_size - len(salt)
+    if last > 1 << (8 * counter_size):
+        raise ValueError("CTR counter overflow: data too long for this salt")
+    counters = np.arange(first, last, dtype=np.uint64).astype('>u8')
+    blocks = np.empty((last - first, block_size), dtype=np.uint8)
+    blocks[:, :len(salt)] = np.frombuffer(salt, dtype=np.uint8)
+    blocks[:, len(salt):] = counters.view(np.uint8).reshape(-1, 8)[:, 8 - counter_size:]
+    return blocks.tobytes()
+
+
+def ctr_keystream(key, salt, offset, length, backend=DEFAULT_BACKEND, cipher=None):
+    """
+    Generate CTR keystream bytes for an arbitrary byte range
     
-    # Remove padding
-    padded_plaintext = b''.join(plaintext_blocks)
-    try:
-        return unpad(padded_plaintext, block_size)
-    except ValueError:
-        # If unpadding fails, return the raw plaintext (might be incorrect key)
-        return padded_plaintext
+    Args:
+        key: Encryption key or keyring handle
+        salt: Nonce prefix (ctr_nonce_size(backend) bytes)
+        offset: Byte offset of the range in the stream
+        length: Number of keystream bytes
+        backend: Block-cipher backend name
+        cipher: Optional ECB cipher for key, to skip key setup
+    
+    Returns:
+        Keystream bytes
+    """
+    block_size = get_block_size(backend)
+    if len(salt) != ctr_nonce_size(backend):
+        raise ValueError(f"Salt must be {ctr_nonce_size(backend)} bytes for CTR mode")
+    if offset < 0:
+        raise ValueError("Offset must not be negative")
+    if length <= 0:
+        return b''
+    if cipher is None:
+        cipher = new_block_cipher(key, backend)
+    
+    first = offset // block_size
+    last = -(-(offset + length) // block_size)
+    keystream = cipher.encrypt(_ctr_counter_blocks(salt, block_size, first, last))
+    start = offset - first * block_size
+    return keystream[start:start + length]
 
 
-def measure_performance():
-    """Measure and compare performance of different encryption methods"""
-    import timeit
-    import random
-    import string
+def ctr_xor_into(buffer, key, salt, offset=0, backend=DEFAULT_BACKEND):
+    """
+    Encrypt or decrypt a writable buffer in place with salted CTR mode
     
-    # Generate test data
-    test_sizes = [8, 64, 512, 4096, 32768]  # Test with different data sizes
-    results = {
-        'cfb_encrypt': [],
-        'cfb_decrypt': [],
-        'cbc_encrypt': [],
-        'cbc_decrypt': []
-    }
+    Args:
+        buffer: Writable buffer (bytearray, memoryview, mmap)
+        key: Encryption key or keyring handle
+        salt: Nonce prefix (ctr_nonce_size(backend) bytes)
+        offset: Byte offset of buffer[0] in the stream, so any range of a
+                larger message can be processed on its own
+        backend: Block-cipher backend name
+    
+    Returns:
+        Number of bytes processed
+    """
+    cipher = new_block_cipher(key, backend)
+    view = memoryview(buffer).cast('B')
+    for start in range(0, len(view), CTR_CHUNK_SIZE):
+        end = min(start + CTR_CHUNK_SIZE, len(view))
+        keystream = ctr_keystream(key, salt, offset + start, end - start, backend, cipher)
+        xor_into(view[start:end], keystream)
+    return len(view)
+
+
+def ctr_encrypt(plaintext, key, salt, offset=0, backend=DEFAULT_BACKEND):
+    """
+    CTR mode encryption with salt as nonce prefix (no padding)
+    
+    Args:
+        plaintext: Bytes to encrypt
+        key: Encryption key or keyring handle
+        salt: Nonce prefix (ctr_nonce_size(backend) bytes)
+        offset: Byte offset of plaintext[0] in the stream
+        backend: Block-cipher backend name
+    
+    Returns:
+        Tuple of (ciphertext, salt)
+    """
+    timer = _metrics.timer('ctr_encrypt', backend) if _metrics is not None else None
+    output = bytearray(plaintext)
+    ctr_xor_into(output, key, salt, offset, backend)
+    if timer is not None:
+        timer.done('block loop', len(plaintext), len(output), -(-len(output) // get_block_size(backend)))
+    return bytes(output), salt
+
+
+def ctr_decrypt(ciphertext, key, salt, offset=0, backend=DEFAULT_BACKEND):
+    """
+    CTR mode decryption with salt as nonce prefix
+    
+    Args:
+        ciphertext: Bytes to decrypt
+        key: Decryption key or keyring handle
+        salt: Nonce prefix used for encryption
+        offset: Byte offset of ciphertext[0] in the stream
+        backend: Block-cipher backend name
+    
+    Returns:
+        Decrypted plaintext
+    """
+    timer = _metrics.timer('ctr_decrypt', backend) if _metrics is not None else None
+    output = bytearray(ciphertext)
+    ctr_xor_into(output, key, salt, offset, backend)
+    if timer is not None:
+        timer.done('block loop', len(ciphertext), len(output), -(-len(output) // get_block_size(backend)))
+    return bytes(output)
+
+
+class _SaltedStream:
+    """Shared state for incremental CBC/CFB processing"""
+    
+    def __init__(self, mode, key, salt, backend=DEFAULT_BACKEND, fast=False):
+        self.mode = mode.upper()
+        if self.mode not in ('CFB', 'CBC'):
+            raise ValueError("Mode must be 'cfb' or 'cbc'")
+        self.block_size = _resolve_block_size(backend, None, salt, self.mode)
+        self.salt = salt
+        self.native = fast and has_native_modes(backend)
+        if self.native:
+            self.cipher = _new_native_cipher(key, backend, self.mode, salt)
+        else:
+            self.cipher = new_block_cipher(key, backend)
+        self.previous = salt  # Chaining block carried between chunks
+        self.pending = bytearray()
+        self.finalized = False
+    
+    def _take(self, n):
+        """Remove and return the first n pending bytes"""
+        chunk = bytes(self.pending[:n])
+        del self.pending[:n]
+        return chunk
+    
+    def _check_open(self):
+        if self.finalized:
+            raise ValueError("Stream has already been finalized")
+    
+    def _check_aligned(self, data, output):
+        self._check_open()
+        if self.pending:
+            raise ValueError("update_into() cannot follow a partial update()")
+        if len(data) % self.block_size or len(output) != len(data):
+            raise ValueError("update_into() needs whole blocks and an output of the same length")
+
+
+class SaltedEncryptor(_SaltedStream):
+    """
+    Incremental salted CBC/CFB encryption
+    
+    Feeding a message through update() in any chunking and then calling
+    finalize() yields the same bytes as cbc_encrypt/cfb_encrypt.
+    """
+    
+    def _encrypt_blocks(self, data):
+        """Encrypt whole blocks, advancing the chain"""
+        if self.native:
+            return self.cipher.encrypt(data)
+        
+        bs = self.block_size
+        encrypt = self.cipher.encrypt
+        previous = self.previous
+        out = []
+        for i in range(0, len(data), bs):
+            if self.mode == 'CBC':
+                previous = encrypt(xor_bytes(data[i:i+bs], previous))
+            else:
+                previous = xor_bytes(data[i:i+bs], encrypt(previous))
+            out.append(previous)
+        self.previous = previous
+        return b''.join(out)
+    
+    def update_into(self, data, output):
+        """
+        Encrypt whole blocks from data straight into a writable buffer
+        
+        data and output may be the same buffer (e.g. an mmap) for in-place
+        encryption. Native backends write without any intermediate copy.
+        """
+        self._check_aligned(data, output)
+        if self.native:
+            self.cipher.encrypt(data, output=output)
+        else:
+            output[:] = self._encrypt_blocks(data)
+        return len(data)
+    
+    def update(self, data):
+        """Encrypt as many whole blocks as are available and return them"""
+        self._check_open()
+        self.pending += data
+        n = len(self.pending) - len(self.pending) % self.block_size
+        if not n:
+            return b''
+        return self._encrypt_blocks(self._take(n))
+    
+    def finalize(self):
+        """Pad and encrypt the remaining bytes"""
+        self._check_open()
+        self.finalized = True
+        return self._encrypt_blocks(pad(self._take(len(self.pending)), self.block_size))
+
+
+class SaltedDecryptor(_SaltedStream):
+    """
+    Incremental salted CBC/CFB decryption
+    
+    The final block is held back until finalize() so its padding can be
+    removed; the output matches cbc_decrypt/cfb_decrypt on the whole input.
+    """
+    
+    def __init__(self, mode, key, salt, backend=DEFAULT_BACKEND, fast=False):
+        super().__init__(mode, key, salt, backend, fast)
+        self.total = 0
+    
+    def _decrypt_blocks(self, data):
+        """Decrypt whole blocks (or a final partial CFB block), advancing the chain"""
+        if self.native:
+            return self.cipher.decrypt(data)
+        
+        bs = self.block_size
+        num_blocks = -(-len(data) // bs)
+        # Same bulk scheme as cbc_decrypt/cfb_decrypt, chained on the last block seen
+        shifted = self.previous + data[:(num_blocks - 1) * bs]
+        # Copy: data may be a view the caller overwrites with plaintext
+        self.previous = bytes(data[(num_blocks - 1) * bs:])
+        if self.mode == 'CBC':
+            return xor_bytes(self.cipher.decrypt(data), shifted)
+        return xor_bytes(data, self.cipher.encrypt(shifted))
+    
+    def update_into(self, data, output):
+        """
+        Decrypt whole blocks from data straight into a writable buffer
+        
+        Nothing is held back, so the caller passes the final block through
+        update() and finalize() to strip the padding. data and output may
+        be the same buffer for in-place decryption.
+        """
+        self._check_aligned(data, output)
+        self.total += len(data)
+        if self.native:
+            self.cipher.decrypt(data, output=output)
+        else:
+            output[:] = self._decrypt_blocks(data)
+        return len(data)
+    
+    def update(self, data):
+        """Decrypt all buffered blocks except the last one and return them"""
+        self._check_open()
+        self.pending += data
+        self.total += len(data)
+        # Hold back at least one byte, i.e. the whole final (possibly partial) block
+        n = (len(self.pending) - 1) // self.block_size * self.block_size
+        if n <= 0:
+            return b''
+        return self._decrypt_blocks(self._take(n))
+    
+    def finalize(self):
+        """Decrypt the held-back block and remove its padding"""
+        self._check_open()
+        self.finalized = True
+        if not self.pending:
+            return b''
+        if self.mode == 'CBC' and len(self.pending) % self.block_size:
+            raise ValueError("Ciphertext length must be a multiple of the block size")
+        
+        last = self._decrypt_blocks(self._take(len(self.pending)))
+        if self.total % self.block_size:
+            # A truncated CFB stream cannot be padded; keep the raw plaintext
+            return last
+        return _unpad_or_raw(last, self.block_size, 'SaltedDecryptor')
+
+
+class SaltedCipher:
+    """
+    Reusable salted CBC/CFB/CTR context
+    
+    The backend cipher (expanded key schedule and lookup tables), padding
+    blocks and an output scratch buffer are prepared once, so encrypt() and
+    decrypt() skip all per-call setup. Output is identical to the
+    corresponding module functions. Not thread safe: use one per thread.
+    """
+    
+    __slots__ = ('mode', 'backend', 'block_size', 'salt_size', 'cipher', 'fast',
+                 '_key', '_encrypt_block', '_decrypt_block', '_pads', '_scratch')
+    
+    # With fast=True, messages at least this long use the native chaining
+    # cipher; its per-call key setup only pays off for larger inputs
+    NATIVE_THRESHOLD = 4096
+    
+    def __init__(self, key, mode='cbc', backend=DEFAULT_BACKEND, fast=False):
+        """
+        Args:
+            key: Key bytes or keyring handle
+            mode: 'cfb', 'cbc' or 'ctr'
+            backend: Block-cipher backend name
+            fast: Use the native CBC/CFB implementation for large messages
+        """
+        self.mode = mode.upper()
+        if self.mode not in ('CFB', 'CBC', 'CTR'):
+            raise ValueError("Mode must be 'cfb', 'cbc' or 'ctr'")
+        self.backend = backend
+        self.block_size = get_block_size(backend)
+        self.salt_size = ctr_nonce_size(backend) if self.mode == 'CTR' else self.block_size
+        self.cipher = new_block_cipher(key, backend)
+        self.fast = fast and self.mode != 'CTR' and has_native_modes(backend)
+        self._key = key
+        self._encrypt_block = self.cipher.encrypt
+        self._decrypt_block = self.cipher.decrypt
+        self._pads = [bytes([n]) * n for n in range(self.block_size + 1)]
+        self._scratch = bytearray(4096)
+    
+    def _check_salt(self, salt):
+        if len(salt) != self.salt_size:
+            raise ValueError(f"Salt must be {self.salt_size} bytes for {self.mode} mode")
+    
+    def _unpad_or_raw(self, padded):
+        """Same result as _unpad_or_raw(), using the precomputed padding blocks"""
+        bs = self.block_size
+        if padded and len(padded) % bs == 0:
+            pad_len = padded[-1]
+            if 0 < pad_len <= bs and padded[-pad_len:] == self._pads[pad_len]:
+                return padded[:-pad_len]
+        if _metrics is not None:
+            _metrics.add('padding_failures_total', function='SaltedCipher.decrypt')
+        return padded
+    
+    def encrypt(self, data, salt=None):
+        """
+        Encrypt data, generating a salt if none is given
+        
+        CTR on 64-bit block backends needs an explicit unique salt (see
+        generate_ctr_salt).
+        
+        Returns:
+            Tuple of (ciphertext, salt)
+        """
+        if salt is None:
+            salt = generate_ctr_salt(self.backend) if self.mode == 'CTR' else os.urandom(self.salt_size)
+        else:
+            self._check_salt(salt)
+        
+        if self.mode == 'CTR':
+            keystream = ctr_keystream(self._key, salt, 0, len(data), self.backend, self.cipher)
+            return xor_bytes(data, keystream), salt
+        
+        bs = self.block_size
+        if self.fast and len(data) >= self.NATIVE_THRESHOLD:
+            cipher = _new_native_cipher(self._key, self.backend, self.mode, salt)
+            return cipher.encrypt(data + self._pads[bs - len(data) % bs]), salt
+        
+        full = len(data) - len(data) % bs
+        total = full + bs
+        if len(self._scratch) < total:
+            self._scratch = bytearray(total)
+        out = self._scratch
+        encrypt_block = self._encrypt_block
+        previous = int.from_bytes(salt, 'big')
+        cbc = self.mode == 'CBC'
+        
+        # Full blocks, then the padded final block, chained as integers
+        last = data[full:] + self._pads[bs - len(data) % bs]
+        for i in range(0, total, bs):
+            block = int.from_bytes(data[i:i+bs] if i < full else last, 'big')
+            if cbc:
+                encrypted = encrypt_block((block ^ previous).to_bytes(bs, 'big'))
+            else:
+                keystream = int.from_bytes(encrypt_block(previous.to_bytes(bs, 'big')), 'big')
+                encrypted = (block ^ keystream).to_bytes(bs, 'big')
+            out[i:i+bs] = encrypted
+            previous = int.from_bytes(encrypted, 'big')
+        
+        return bytes(memoryview(out)[:total]), salt
+    
+    def decrypt(self, data, salt):
+        """Decrypt data encrypted with the given salt"""
+        self._check_salt(salt)
+        
+        if self.mode == 'CTR':
+            keystream = ctr_keystream(self._key, salt, 0, len(data), self.backend, self.cipher)
+            return xor_bytes(data, keystream)
+        
+        bs = self.block_size
+        if self.fast and len(data) >= self.NATIVE_THRESHOLD:
+            cipher = _new_native_cipher(self._key, self.backend, self.mode, salt)
+            return self._unpad_or_raw(cipher.decrypt(data))
+        
+        # Bulk scheme of cbc_decrypt/cfb_decrypt
+        if self.mode == 'CBC':
+            padded = xor_bytes(self._decrypt_block(data), salt + data[:len(data) - bs])
+        else:
+            num_blocks = -(-len(data) // bs)
+            padded = xor_bytes(data, self._encrypt_block(salt + data[:max(num_blocks - 1, 0) * bs]))
+        return self._unpad_or_raw(padded)
+
+
+def iter_batch(buffer, offsets):
+    """Yield every message of a packed batch buffer as a memoryview"""
+    view = memoryview(buffer)
+    for i in range(len(offsets) - 1):
+        yield view[offsets[i]:offsets[i + 1]]
+
+
+def _batch_positions(lengths):
+    """Offset of every byte of a packed buffer within its own message"""
+    starts = np.cumsum(lengths) - lengths
+    return np.arange(int(lengths.sum())) - np.repeat(starts, lengths)
+
+
+def _batch_offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def encrypt_batch(messages, key, salts=None, mode='cbc', backend=DEFAULT_BACKEND):
+    """
+    Encrypt many small messages with salted CBC or CFB in one call
+    
+    All salts are generated at once and every message's chain advances in
+    lockstep: each block index is a single backend call across all the
+    messages that are that long, so the interpreter overhead is per batch
+    instead of per message. Each ciphertext equals cbc_encrypt/cfb_encrypt
+    of that message with its salt.
+    
+    Args:
+        messages: Sequence of plaintext bytes
+        key: Encryption key or keyring handle
+        salts: Optional sequence of one-block salts (generated if omitted)
+        mode: 'cbc' or 'cfb'
+        backend: Block-cipher backend name (see BACKENDS)
+    
+    Returns:
+        Tuple of (ciphertext buffer, offsets, salts); message i occupies
+        buffer[offsets[i]:offsets[i+1]]
+    """
+    mode = mode.upper()
+    if mode not in ('CBC', 'CFB'):
+        raise ValueError("Batch mode must be 'cbc' or 'cfb'")
+    timer = _metrics.timer('encrypt_batch', backend) if _metrics is not None else None
+    block_size = get_block_size(backend)
+    count = len(messages)
+    
+    if salts is None:
+        packed_salts = os.urandom(count * block_size)
+        salts = [packed_salts[i:i+block_size] for i in range(0, len(packed_salts), block_size)]
+    else:
+        salts = list(salts)
+        if len(salts) != count or any(len(salt) != block_size for salt in salts):
+            raise ValueError(f"Need one {block_size}-byte salt per message")
+        packed_salts = b''.join(salts)
+    if timer is not None:
+        timer.lap('salt generation')
+    
+    # PKCS#7 pad every message into one packed buffer
+    lengths = np.fromiter(map(len, messages), dtype=np.int64, count=count)
+    pad_lens = block_size - lengths % block_size
+    padded_lens = lengths + pad_lens
+    offsets = _batch_offsets(padded_lens)
+    padded = np.empty(int(offsets[-1]), dtype=np.uint8)
+    is_data = _batch_positions(padded_lens) < np.repeat(lengths, padded_lens)
+    padded[is_data] = np.frombuffer(b''.join(messages), dtype=np.uint8)
+    padded[~is_data] = np.repeat(pad_lens, pad_lens)
+    
+    blocks = padded.reshape(-1, block_size)
+    ciphertext = np.empty_like(blocks)
+    
+    # Longest messages first, so the chains still running at any block
+    # index are a prefix of this order
+    order = np.argsort(-padded_lens, kind='stable')
+    first_blocks = (offsets[:-1] // block_size)[order]
+    block_counts = (padded_lens // block_size)[order]
+    previous = np.frombuffer(packed_salts, dtype=np.uint8).reshape(count, block_size)[order]
+    if timer is not None:
+        timer.lap('padding')
+    
+    cipher = new_block_cipher(key, backend)
+    if timer is not None:
+        timer.lap('key setup')
+    for index in range(int(block_counts[0]) if count else 0):
+        active = int(np.count_nonzero(block_counts > index))
+        rows = first_blocks[:active] + index
+        if mode == 'CBC':
+            encrypted = cipher.encrypt((blocks[rows] ^ previous[:active]).tobytes())
+            chained = np.frombuffer(encrypted, dtype=np.uint8).reshape(active, block_size)
+        else:
+            keystream = cipher.encrypt(previous[:active].tobytes())
+            chained = blocks[rows] ^ np.frombuffer(keystream, dtype=np.uint8).reshape(active, block_size)
+        ciphertext[rows] = chained
+        previous[:active] = chained
+    
+    if timer is not None:
+        timer.done('block loop', int(lengths.sum()), ciphertext.size, len(blocks))
+    return ciphertext.tobytes(), offsets.tolist(), salts
+
+
+def decrypt_batch(items, key, mode='cbc', backend=DEFAULT_BACKEND):
+    """
+    Decrypt many salted CBC or CFB messages in one call
+    
+    Decryption needs no chaining, so every block of every message goes
+    through one backend call and padding is stripped for all messages at
+    once. Each plaintext equals cbc_decrypt/cfb_decrypt of that message,
+    including the raw-plaintext fallback for invalid padding.
+    
+    Args:
+        items: Sequence of (ciphertext, salt) pairs, e.g.
+               zip(iter_batch(buffer, offsets), salts)
+        key: Decryption key or keyring handle
+        mode: 'cbc' or 'cfb'
+        backend: Block-cipher backend name (see BACKENDS)
+    
+    Returns:
+        Tuple of (plaintext buffer, offsets)
+    """
+    mode = mode.upper()
+    if mode not in ('CBC', 'CFB'):
+        raise ValueError("Batch mode must be 'cbc' or 'cfb'")
+    timer = _metrics.timer('decrypt_batch', backend) if _metrics is not None else None
+    block_size = get_block_size(backend)
+    items = list(items)
+    count = len(items)
+    
+    packed_salts = b''.join(salt for _, salt in items)
+    if len(packed_salts) != count * block_size:
+        raise ValueError(f"Need one {block_size}-byte salt per message")
+    salts = np.frombuffer(packed_salts, dtype=np.uint8).reshape(count, block_size)
+    
+    lengths = np.fromiter((len(ciphertext) for ciphertext, _ in items), dtype=np.int64, count=count)
+    aligned_lens = -(-lengths // block_size) * block_size
+    if mode == 'CBC' and np.any(aligned_lens != lengths):
+        raise ValueError("CBC ciphertexts must be a multiple of the block size")
+    
+    # CFB may end on a partial block: zero-fill it and drop the extra bytes
+    offsets = _batch_offsets(aligned_lens)
+    data = np.zeros(int(offsets[-1]), dtype=np.uint8)
+    data[_batch_positions(aligned_lens) < np.repeat(lengths, aligned_lens)] = \
+        np.frombuffer(b''.join(ciphertext for ciphertext, _ in items), dtype=np.uint8)
+    blocks = data.reshape(-1, block_size)
+    
+    # Chaining input of every block: the previous ciphertext block, or the
+    # salt for the first block of a message
+    previous = np.empty_like(blocks)
+    previous[1:] = blocks[:-1]
+    nonempty = aligned_lens > 0
+    previous[offsets[:-1][nonempty] // block_size] = salts[nonempty]
+    if timer is not None:
+        timer.lap('packing')
+    
+    cipher = new_block_cipher(key, backend)
+    if timer is not None:
+        timer.lap('key setup')
+    if mode == 'CBC':
+        decrypted = np.frombuffer(cipher.decrypt(blocks.tobytes()), dtype=np.uint8)
+    else:
+        decrypted = np.frombuffer(cipher.encrypt(previous.tobytes()), dtype=np.uint8)
+    plaintext = decrypted ^ previous.reshape(-1) if mode == 'CBC' else decrypted ^ data
+    if timer is not None:
+        timer.lap('block loop')
+    
+    # Validate PKCS#7 padding for all messages; invalid ones stay raw
+    ends = offsets[1:]
+    valid = (lengths > 0) & (lengths == aligned_lens)
+    pad_lens = np.zeros(count, dtype=np.int64)
+    pad_lens[valid] = plaintext[ends[valid] - 1]
+    valid &= (pad_lens >= 1) & (pad_lens <= block_size)
+    for position in range(2, block_size + 1):
+        check = valid & (pad_lens >= position)
+        valid[check] = plaintext[ends[check] - position] == pad_lens[check]
+    pad_lens[~valid] = 0
     
-    # Generate random key and salt
-    key = os.urandom(16)  # 128-bit key
-    salt = os.urandom(8)  # 64-bit salt/IV
-    
-    for size in test_sizes:
-        # Generate random test data
-        data = ''.join(random.choices(string.ascii_letters + string.digits, k=size)).encode()
-        
-        # Time CFB encryption/decryption
-        cfb_enc_time = timeit.timeit(
-            lambda: cfb_encrypt(data, key, salt),
-            number=100
-        ) / 100  # Average time per operation
-        
-        # Get ciphertext for decryption timing
-        cfb_ciphertext, _ = cfb_encrypt(data, key, salt)
-        cfb_dec_time = timeit.timeit(
-            lambda: cfb_decrypt(cfb_ciphertext, key, salt),
-            number=100
-        ) / 100
-        
-        # Time CBC encryption/decryption
-        cbc_enc_time = timeit.timeit(
-            lambda: cbc_encrypt(data, key, salt),
-            number=100
-        ) / 100
-        
-        # Get ciphertext for decryption timing
-        cbc_ciphertext, _ = cbc_encrypt(data, key, salt)
-        cbc_dec_time = timeit.timeit(
-            lambda: cbc_decrypt(cbc_ciphertext, key, salt),
-            number=100
-        ) / 100
-        
-        # Store results
-        results['cfb_encrypt'].append((size, cfb_enc_time * 1000))  # Convert to ms
-        results['cfb_decrypt'].append((size, cfb_dec_time * 1000))
-        results['cbc_encrypt'].append((size, cbc_enc_time * 1000))
-        results['cbc_decrypt'].append((size, cbc_dec_time * 1000))
-        
-        print(f"Size: {size} bytes")
-        print(f"  CFB Encrypt: {cfb_enc_time * 1000:.4f} ms")
-        print(f"  CFB Decrypt: {cfb_dec_time * 1000:.4f} ms")
-        print(f"  CBC Encrypt: {cbc_enc_time * 1000:.4f} ms")
-        print(f"  CBC Decrypt: {cbc_dec_time * 1000:.4f} ms")
-    
-    # Plot results
-    plt.figure(figsize=(12, 8))
-    
-    # Plot encryption times
-    plt.subplot(2, 1, 1)
-    plt.plot(
-        [x[0] for x in results['cfb_encrypt']],
-        [x[1] for x in results['cfb_encrypt']],
-        'b-', label='CFB Encrypt'
-    )
-    plt.plot(
-        [x[0] for x in results['cbc_encrypt']],
-        [x[1] for x in results['cbc_encrypt']],
-        'r-', label='CBC Encrypt'
-    )
-    plt.title('Encryption Performance')
-    plt.xlabel('Data Size (bytes)')
-    plt.ylabel('Time (ms)')
-    plt.legend()
-    plt.grid(True)
-    
-    # Plot decryption times
-    plt.subplot(2, 1, 2)
-    plt.plot(
-        [x[0] for x in results['cfb_decrypt']],
-        [x[1] for x in results['cfb_decrypt']],
-        'b--', label='CFB Decrypt'
-    )
-    plt.plot(
-        [x[0] for x in results['cbc_decrypt']],
-        [x[1] for x in results['cbc_decrypt']],
-        'r--', label='CBC Decrypt'
-    )
-    plt.title('Decryption Performance')
-    plt.xlabel('Data Size (bytes)')
-    plt.ylabel('Time (ms)')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.tight_layout()
-    plt.savefig('encryption_performance.png')
-    print("Performance graphs saved as 'encryption_performance.png'")
+    out_lens = lengths - pad_lens
+    keep = _batch_positions(aligned_lens) < np.repeat(out_lens, aligned_lens)
+    if timer is not None:
+        failures = count - int(np.count_nonzero(valid))
+        if failures:
+            timer.metrics.add('padding_failures_total', failures, function='decrypt_batch')
+        timer.done('unpadding', int(lengths.sum()), int(out_lens.sum()), len(blocks))
+    return plaintext[keep].tobytes(), _batch_offsets(out_lens).tolist()
 
 
 if __name__ == "__main__":
@@ -419,6 +1644,7 @@ if __name__ == "__main__":
     cbc_plain = cbc_decrypt(cbc_cipher, key, salt)
     print(f"CBC Decrypted: {cbc_plain}")
     
-    # Run performance tests
+    # Run performance tests (plotting lives outside the core module)
     print("\nRunning performance tests...")
+    from performance_analysis import measure_performance
     measure_performance()
@@ -0,0 +1,108 @@
+"""
+Startup Benchmark: CLI process start-up time and import cost
+Times fresh interpreters running one-shot commands and breaks the import
+time of main.py down by module, flagging heavy dependencies that should
+only load on demand (e.g. for --mode test)
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules the one-shot encrypt/decrypt path must not import
+HEAVY_MODULES = ['numpy', 'matplotlib', 'pandas', 'reportlab', 'asyncio', 'concurrent.futures']
+
+SCENARIOS = [
+    ('interpreter only', ['-c', 'pass']),
+    ('import present_cipher', ['-c', 'import present_cipher']),
+    ('import main', ['-c', 'import main']),
+    ('one-shot CBC encrypt', ['main.py', '--mode', 'cbc', '--action', 'encrypt', '--input', 'startup benchmark']),
+]
+
+
+def _env():
+    # Let the children cache bytecode, as an installed deployment would
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def time_command(args, runs):
+    """Wall-clock seconds of each of runs fresh interpreter processes"""
+    command = [sys.executable] + args
+    subprocess.run(command, cwd=HERE, env=_env(), capture_output=True)  # Warm-up, writes .pyc
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=HERE, env=_env(), capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def import_profile(module='main'):
+    """
+    Parse python -X importtime for one import
+    
+    Returns:
+        List of (module, self microseconds, cumulative microseconds, depth)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=HERE, env=_env(), capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time and import cost")
+    parser.add_argument('--runs', type=int, default=10, help='Processes per scenario (default: 10)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list (default: 10)')
+    args = parser.parse_args()
+    
+    print("\n" + "="*80)
+    print("CLI STARTUP BENCHMARK")
+    print("="*80)
+    print(f"{'Scenario':<28s} {'Median (ms)':>12s} {'Min (ms)':>10s} {'Max (ms)':>10s}")
+    print("-" * 80)
+    for label, command in SCENARIOS:
+        times = [t * 1000 for t in time_command(command, args.runs)]
+        print(f"{label:<28s} {statistics.median(times):12.1f} {min(times):10.1f} {max(times):10.1f}")
+    
+    entries = import_profile('main')
+    # importtime lists a module after everything it imported, so main's
+    # subtree is the run of deeper entries just before it
+    main_index = max(i for i, e in enumerate(entries) if e[0] == 'main')
+    main_depth = entries[main_index][3]
+    first = main_index
+    while first > 0 and entries[first - 1][3] > main_depth:
+        first -= 1
+    subtree = entries[first:main_index]
+    
+    print("\n" + "-" * 80)
+    print(f"import main: {entries[main_index][2] / 1000:.1f} ms cumulative")
+    print("\nDirect imports of main (cumulative):")
+    direct = [e for e in subtree if e[3] == main_depth + 1]
+    for name, _, cumulative_us, _ in sorted(direct, key=lambda e: -e[2])[:args.top]:
+        print(f"  {name:<40s} {cumulative_us / 1000:8.1f} ms")
+    print("\nSlowest modules (self time):")
+    for name, self_us, _, _ in sorted(subtree, key=lambda e: -e[1])[:args.top]:
+        print(f"  {name:<40s} {self_us / 1000:8.1f} ms")
+    
+    loaded = {e[0] for e in subtree}
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+    print("\nHeavy modules imported by main: " + (', '.join(heavy) if heavy else 'none'))
+    sys.exit(1 if heavy else 0)
+
+
+if __name__ == "__main__":
+    main()